@@ -1,13 +1,75 @@
+import hashlib
+import os
 from abc import ABC, abstractmethod
 from typing import Dict, List, Optional
 from collections import defaultdict, deque
-from PySide6.QtCore import QThread, Signal
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import threading
+import time
+import tracemalloc
+from MTBaseNodeManager.Profiling import NodeTiming, timed_execute, write_chrome_trace, format_timing
+
+class NodeSignal:
+    """
+    Minimal pure-Python signal with the connect/disconnect/emit interface of a Qt signal.
+    Slots run synchronously in the emitting thread; use QtNodeSignals to deliver them on the Qt main thread.
+    """
 
-class MTBaseNode(QThread):
-    finished = Signal()
+    def __init__(self):
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot):
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        with self._lock:
+            if slot is None:
+                self._slots.clear()
+            elif slot in self._slots:
+                self._slots.remove(slot)
+
+    def emit(self, *args):
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            slot(*args)
+
+
+class WorkflowCancelled(Exception):
+    """工作流被取消时在节点中抛出"""
+
+
+class CancelToken:
+    """
+    Thread-safe cancellation flag shared by a WorkflowEngine and its nodes.
+    The engine checks it between nodes, long-running nodes call check() inside their loops.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def reset(self):
+        self._event.clear()
 
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        """已取消时抛出 WorkflowCancelled"""
+        if self._event.is_set():
+            raise WorkflowCancelled("工作流已取消")
+
+
+class MTBaseNode:
     def __init__(self, node_id: str, label: str):
-        super().__init__()
+        self.finished = NodeSignal()  # 节点执行完成信号
+        self.cancel_token: Optional[CancelToken] = None  # 执行时由 WorkflowEngine 设置
         self.id = node_id          # 唯一标识符
         self.label = label        # 显示名称
         self.position = (0, 0)    # 坐标 (x,y)
@@ -19,7 +81,7 @@ class MTBaseNode(QThread):
         #参数
         self.params = {}  # 节点参数
 
-        # 执行状态
+        # 执行状态: (缓存键, 输出)，由 WorkflowEngine 维护
         self._result_cache = None
 
     def add_input_port(self, name: str, data_type: type):
@@ -38,15 +100,50 @@ class MTBaseNode(QThread):
         """节点核心逻辑"""
         pass
 
+    def check_cancelled(self):
+        """在耗时的循环中调用，工作流已取消时抛出 WorkflowCancelled"""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def cache_token(self) -> any:
+        """返回参数以外会影响执行结果的状态 (如输入文件的修改时间)，用于结果缓存的键"""
+        return None
+
     def validate_connections(self, target: 'MTBaseNode', source_port: str, target_port: str) -> bool:
         """验证端口连接是否合法"""
         src_type = self.output_ports.get(source_port)
         dst_type = target.input_ports.get(target_port)
         return src_type == dst_type or dst_type == any
 
+    def __getstate__(self):
+        """序列化时不包含信号连接、取消标志和缓存结果，便于在进程池中传递节点"""
+        state = self.__dict__.copy()
+        state.pop('finished', None)
+        state.pop('cancel_token', None)
+        state['_result_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.finished = NodeSignal()
+        self.cancel_token = None
+
     def __repr__(self):
         return f"<{self.__class__.__name__} {self.id}>"
 
+
+def _execute(node: MTBaseNode, inputs: dict, profile: bool = False):
+    """执行节点，返回 (输出, 计时)，不统计时计时为 None"""
+    if profile:
+        return timed_execute(node, inputs)
+    return node.execute(inputs), None
+
+
+def _execute_in_process(node: MTBaseNode, inputs: dict, profile: bool = False):
+    """进程池中执行节点，同时返回节点执行后的状态以便同步回主进程"""
+    output, timing = _execute(node, inputs, profile)
+    return output, timing, node.__getstate__()
+
 from dataclasses import dataclass
 
 @dataclass
@@ -57,14 +154,27 @@ class Connection:
     target_port: str
     data_type: type  # 保存连接时的数据类型
 
+    @property
+    def key(self) -> tuple:
+        """连接的唯一标识，不含数据类型"""
+        return (self.source_node_id, self.source_port, self.target_node_id, self.target_port)
+
     def __repr__(self):
         return f"{self.source_node_id}.{self.source_port} -> {self.target_node_id}.{self.target_port}"
 
 class ConnectionManager:
     def __init__(self):
-        self.connections: List[Connection] = []
+        self._connections: Dict[tuple, Connection] = {}  # {连接键: 连接}，保持添加顺序
         self.nodes = {}  # {node_id: node}
-        self._lookup_cache = {}  # 用于快速查询
+        # 增量维护的邻接索引，所有查询均为 O(1) 或 O(度数)
+        self._incoming: Dict[str, Dict[tuple, Connection]] = defaultdict(dict)  # {目标节点: {连接键: 连接}}
+        self._outgoing: Dict[str, Dict[tuple, Connection]] = defaultdict(dict)  # {源节点: {连接键: 连接}}
+        self._lookup_cache: Dict[tuple, Dict[tuple, Connection]] = defaultdict(dict)  # {(目标节点, 端口): {连接键: 连接}}
+
+    @property
+    def connections(self) -> List[Connection]:
+        """按添加顺序排列的所有连接"""
+        return list(self._connections.values())
 
     def add_connection(self, source_node: MTBaseNode, source_port: str,
                        target_node: MTBaseNode, target_port: str) -> bool:
@@ -90,12 +200,12 @@ class ConnectionManager:
         print(f"创建连接: {new_conn}")
 
         # 检查是否已存在相同连接
-        if not any(self._is_same_connection(new_conn, c) for c in self.connections):
-            self.connections.append(new_conn)
+        if new_conn.key not in self._connections:
+            self._connections[new_conn.key] = new_conn
+            self._index(new_conn)
             self.add_node(source_node)
             self.add_node(target_node)
             print(f"节点数量: {len(self.nodes)}")
-            self._update_cache()
             return True
         return False
 
@@ -108,30 +218,22 @@ class ConnectionManager:
 
     def remove_connection(self, source_node: MTBaseNode, source_port: str,
                           target_node: MTBaseNode, target_port: str) -> bool:
-        src_type = source_node.output_ports[source_port]
-        conn = Connection(
-            source_node_id=source_node.id,
-            source_port=source_port,
-            target_node_id=target_node.id,
-            target_port=target_port,
-            data_type=src_type
-        )
-        # 
-        if conn in self.connections:
+        key = (source_node.id, source_port, target_node.id, target_port)
+        conn = self._connections.pop(key, None)
+        if conn is not None:
             print(f"移除连接: {conn}")
-            self.connections.remove(conn)
+            self._unindex(conn)
             self.check_and_remove_node(source_node.id)
             self.check_and_remove_node(target_node.id)
-            self._update_cache()
             print(f"节点数量: {len(self.nodes)}")
             return True
-        print(f"连接不存在: {conn}")
+        print(f"连接不存在: {'.'.join(key[:2])} -> {'.'.join(key[2:])}")
         return False
     
 
     def check_and_remove_node(self, node_id: str):
         """检查节点是否需要被移除"""
-        if not self.get_connections_from(node_id) and not self.get_connections_to(node_id):
+        if not self._outgoing.get(node_id) and not self._incoming.get(node_id) and node_id in self.nodes:
             print(f"移除节点: {node_id}")
             self.nodes.pop(node_id)
             return True
@@ -147,42 +249,53 @@ class ConnectionManager:
             valid = False
         return valid
 
-    def _is_same_connection(self, c1: Connection, c2: Connection) -> bool:
-        return (c1.source_node_id == c2.source_node_id and
-                c1.source_port == c2.source_port and
-                c1.target_node_id == c2.target_node_id and
-                c1.target_port == c2.target_port)
-
     def get_connections_to(self, node_id: str) -> List[Connection]:
         """获取连接到指定节点的所有输入连接"""
-        return [c for c in self.connections if c.target_node_id == node_id]
+        return list(self._incoming[node_id].values()) if node_id in self._incoming else []
 
     def get_connections_from(self, node_id: str) -> List[Connection]:
         """获取从指定节点出发的所有输出连接"""
-        return [c for c in self.connections if c.source_node_id == node_id]
-
-    def _update_cache(self):
-        """更新快速查询缓存"""
-        self._lookup_cache = {}
-        for conn in self.connections:
-            key = (conn.target_node_id, conn.target_port)
-            if key not in self._lookup_cache:
-                self._lookup_cache[key] = []
-            self._lookup_cache[key].append(conn)
+        return list(self._outgoing[node_id].values()) if node_id in self._outgoing else []
+
+    def _index(self, conn: Connection):
+        """将连接加入邻接索引"""
+        self._incoming[conn.target_node_id][conn.key] = conn
+        self._outgoing[conn.source_node_id][conn.key] = conn
+        self._lookup_cache[(conn.target_node_id, conn.target_port)][conn.key] = conn
+
+    def _unindex(self, conn: Connection):
+        """从邻接索引中移除连接，并删除空的索引项"""
+        for index, key in ((self._incoming, conn.target_node_id), (self._outgoing, conn.source_node_id),
+                           (self._lookup_cache, (conn.target_node_id, conn.target_port))):
+            index[key].pop(conn.key, None)
+            if not index[key]:
+                del index[key]
 
     def get_inputs_for(self, node_id: str, port: str) -> List[Connection]:
         """获取连接到指定节点端口的输入"""
-        return self._lookup_cache.get((node_id, port), [])
+        key = (node_id, port)
+        return list(self._lookup_cache[key].values()) if key in self._lookup_cache else []
 
 
 class WorkflowEngine:
-    def __init__(self, conn_mgr: ConnectionManager):
+    def __init__(self, conn_mgr: ConnectionManager, max_workers: int = 1, memoize: bool = True,
+                 use_processes: bool = False, profile: bool = False):
         #self.nodes = {node.id: node for node in nodes}
         if not conn_mgr.connections:
             raise ValueError("连接管理器中没有连接")
         self.conn_mgr = conn_mgr
         self.nodes = conn_mgr.nodes
         self.execution_order = []
+        self.max_workers = max_workers  # 同时执行的最大节点数，1 表示按拓扑顺序串行执行
+        self.memoize = memoize  # 复用键未变化的节点结果，只重新执行变化节点及其下游
+        self.use_processes = use_processes  # 并行执行时使用进程池而不是线程池，节点及其输入需可序列化
+        self.profile = profile  # 记录每个节点的耗时、峰值内存和输出大小
+        self.report: Dict[str, NodeTiming] = {}  # 最近一次执行的 {node_id: 计时}，按完成顺序排列
+        self.cancel_token = CancelToken()  # 在其他线程中调用 cancel() 可停止执行
+        # 进度信号，在执行线程中发出
+        self.node_started = NodeSignal()   # (node_id)
+        self.node_finished = NodeSignal()  # (node_id)
+        self.node_failed = NodeSignal()    # (node_id, 错误信息)，取消时错误信息为 WorkflowCancelled 的信息
     
     def prepare_execution(self):
         """生成拓扑排序的执行顺序"""
@@ -192,19 +305,184 @@ class WorkflowEngine:
     
     def execute(self):
         """执行整个工作流"""
+        self.report = {}
+        self.cancel_token.reset()
+        for node in self.nodes.values():
+            node.cancel_token = self.cancel_token
+        # 只停止由本次执行启动的内存跟踪
+        started = self.profile and not tracemalloc.is_tracing()
+        try:
+            if self.max_workers > 1:
+                return self._execute_parallel()
+            return self._execute_serial()
+        finally:
+            if started:
+                tracemalloc.stop()
+            for node in self.nodes.values():
+                node.cancel_token = None
+
+    def cancel(self):
+        """请求停止执行: 不再开始新的节点，正在执行的节点在下一次检查时停止"""
+        self.cancel_token.cancel()
+
+    def _report_failure(self, node_id: str, error: Exception):
+        if isinstance(error, WorkflowCancelled):
+            print(f"节点 {node_id} 已取消")
+        else:
+            print(f"节点 {node_id} 执行失败: {str(error)}")
+        self.node_failed.emit(node_id, str(error))
+
+    def _execute_serial(self) -> dict:
+        """按拓扑顺序逐个执行节点，节点失败后停止"""
         context = {}
+        keys = {}
         for node_id in self.execution_order:
+            if self.cancel_token.cancelled:
+                print("工作流已取消")
+                break
             node = self.nodes[node_id]
+            keys[node_id] = self._node_key(node, keys)
             inputs = self._gather_inputs(node, context)
+            self.node_started.emit(node_id)
             try:
-                output = node.execute(inputs)
+                output = self._cached_output(node, keys[node_id])
+                if output is None:
+                    output = self._execute_node(node, inputs, keys[node_id])
+                else:
+                    self._record_cached(node)
                 node.finished.emit()
                 context[node_id] = output
             except Exception as e:
-                print(f"节点 {node_id} 执行失败: {str(e)}")
+                self._report_failure(node_id, e)
                 break
+            self.node_finished.emit(node_id)
         return context
 
+    def _execute_parallel(self) -> dict:
+        """
+        入度降为 0 的节点立即提交到线程池 (或进程池) 并行执行，节点失败或取消后不再提交新节点。
+        进程池中的节点无法在执行过程中检查取消标志，只在节点之间停止。
+        """
+        graph = self._build_dependency_graph()
+        in_degree = {u: 0 for u in graph}
+        for u in graph:
+            for v in graph[u]:
+                in_degree[v] += 1
+        ready = deque(u for u in graph if in_degree[u] == 0)
+
+        context = {}
+        keys = {}
+        running = {}
+        failed = False
+
+        def complete(node_id, output):
+            # finished 信号在调用线程中发出
+            self.nodes[node_id].finished.emit()
+            context[node_id] = output
+            self.node_finished.emit(node_id)
+            for v in graph[node_id]:
+                in_degree[v] -= 1
+                if in_degree[v] == 0:
+                    ready.append(v)
+
+        executor = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with executor(max_workers=self.max_workers) as pool:
+            while running or (ready and not failed and not self.cancel_token.cancelled):
+                while ready and not failed and not self.cancel_token.cancelled and len(running) < self.max_workers:
+                    node_id = ready.popleft()
+                    node = self.nodes[node_id]
+                    keys[node_id] = self._node_key(node, keys)
+                    self.node_started.emit(node_id)
+                    output = self._cached_output(node, keys[node_id])
+                    if output is not None:
+                        self._record_cached(node)
+                        complete(node_id, output)
+                        continue
+                    inputs = self._gather_inputs(node, context)
+                    if self.use_processes:
+                        future = pool.submit(_execute_in_process, node, inputs, self.profile)
+                    else:
+                        future = pool.submit(_execute, node, inputs, self.profile)
+                    running[future] = node_id
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node_id = running.pop(future)
+                    node = self.nodes[node_id]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self._report_failure(node_id, e)
+                        failed = True
+                        continue
+                    output, timing = result[:2]
+                    if self.use_processes:
+                        node.__dict__.update(result[2])
+                    if timing is not None:
+                        self.report[node_id] = timing
+                    if self.memoize:
+                        node._result_cache = (keys[node_id], output)
+                    complete(node_id, output)
+        if self.cancel_token.cancelled:
+            print("工作流已取消")
+        return context
+
+    def _node_key(self, node: MTBaseNode, keys: Dict[str, str]) -> str:
+        """节点的缓存键: 由节点类型、参数、cache_token 及上游节点的键计算得到"""
+        upstream = sorted((c.target_port, c.source_port, keys[c.source_node_id])
+                          for c in self.conn_mgr.get_connections_to(node.id))
+        state = (type(node).__qualname__, sorted(node.params.items()), node.cache_token(), upstream)
+        return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()
+
+    def _cached_output(self, node: MTBaseNode, key: str) -> Optional[dict]:
+        """键未变化时返回节点上次的输出，否则返回 None"""
+        if self.memoize and node._result_cache is not None and node._result_cache[0] == key:
+            return node._result_cache[1]
+        return None
+
+    def _execute_node(self, node: MTBaseNode, inputs: dict, key: str) -> dict:
+        output, timing = _execute(node, inputs, self.profile)
+        if timing is not None:
+            self.report[node.id] = timing
+        if self.memoize:
+            node._result_cache = (key, output)
+        return output
+
+    def _record_cached(self, node: MTBaseNode):
+        """记录复用缓存结果的节点，耗时为 0"""
+        if self.profile:
+            self.report[node.id] = NodeTiming(node.id, type(node).__name__, time.perf_counter(), cached=True,
+                                              thread=threading.get_ident(), process=os.getpid())
+
+    def run_report(self) -> List[dict]:
+        """
+        Returns the per-node measurements of the last profiled run, slowest node first.
+        Each entry has node_id, node_class, start, wall, cpu, peak_bytes, output_bytes, cached and thread.
+        """
+        return [t.as_dict() for t in sorted(self.report.values(), key=lambda t: t.wall, reverse=True)]
+
+    def print_report(self):
+        """打印最近一次执行的节点耗时表"""
+        total = sum(t.wall for t in self.report.values())
+        print(f"{'节点':<24}{'类型':<32}{'耗时(ms)':>10}{'CPU(ms)':>10}{'峰值(MB)':>10}{'输出(MB)':>10}")
+        for t in sorted(self.report.values(), key=lambda t: t.wall, reverse=True):
+            print(f"{t.node_id:<24}{t.node_class:<32}{t.wall * 1000:>10.1f}{t.cpu * 1000:>10.1f}"
+                  f"{t.peak_bytes / 1024**2:>10.1f}{t.output_bytes / 1024**2:>10.1f}"
+                  + ("  (缓存)" if t.cached else ""))
+        print(f"节点耗时合计: {total * 1000:.1f} ms")
+
+    def write_trace(self, path: str):
+        """将最近一次执行的计时写入 Chrome trace JSON，可在 chrome://tracing 或 Perfetto 中查看"""
+        if not self.report:
+            raise ValueError("没有计时数据，请使用 profile=True 执行工作流")
+        write_chrome_trace(list(self.report.values()), path)
+
+    def clear_cache(self):
+        """清除所有节点的缓存结果，下次执行时全部重新计算"""
+        for node in self.nodes.values():
+            node._result_cache = None
+
     def _build_dependency_graph(self) -> Dict[str, List[str]]:
         """构建节点依赖关系图"""
         graph = {node_id: [] for node_id in self.nodes}
@@ -259,7 +537,10 @@ class WorkflowEngine:
 
         # 添加节点
         for node_id, node in self.nodes.items():
-            dot.node(node_id, f"{node.label}\n({node.id})")
+            label = f"{node.label}\n({node.id})"
+            if node_id in self.report:
+                label += f"\n{format_timing(self.report[node_id])}"
+            dot.node(node_id, label)
 
         # 添加连接
         for conn in self.conn_mgr.connections:
@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import List
+
+
+@dataclass
+class NodeTiming:
+    node_id: str
+    node_class: str
+    start: float           # time.perf_counter() 时刻
+    wall: float = 0.0      # 墙钟时间 (s)
+    cpu: float = 0.0       # 执行线程的 CPU 时间 (s)
+    peak_bytes: int = 0    # 执行期间 tracemalloc 峰值超出开始时内存的部分，并行执行时包含同时运行的其他节点
+    output_bytes: int = 0  # 输出中数组的总字节数
+    cached: bool = False   # 是否直接复用了缓存结果
+    thread: int = 0
+    process: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def output_nbytes(output) -> int:
+    """估计节点输出的数组大小: 累加输出值 (及列表、字典中的值) 的 nbytes 属性"""
+    if output is None:
+        return 0
+    values = output.values() if isinstance(output, dict) else output if isinstance(output, (list, tuple)) else [output]
+    total = 0
+    for value in values:
+        if isinstance(value, (dict, list, tuple)):
+            total += output_nbytes(value)
+        else:
+            nbytes = getattr(value, 'nbytes', 0)
+            total += nbytes if isinstance(nbytes, int) else 0
+    return total
+
+
+def timed_execute(node, inputs: dict):
+    """
+    Executes a node and measures it.
+
+    Returns:
+    output (dict): The node's output.
+    timing (NodeTiming): Wall and CPU time, peak traced memory above what was allocated before the node started,
+                         and output size.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    # 已被之前节点的输出占用的内存不计入本节点
+    current = tracemalloc.get_traced_memory()[0]
+    start, cpu = time.perf_counter(), time.thread_time()
+    output = node.execute(inputs)
+    timing = NodeTiming(node.id, type(node).__name__, start, wall=time.perf_counter() - start,
+                        cpu=time.thread_time() - cpu,
+                        peak_bytes=max(tracemalloc.get_traced_memory()[1] - current, 0),
+                        output_bytes=output_nbytes(output), thread=threading.get_ident(),
+                        process=os.getpid())
+    return output, timing
+
+
+def chrome_trace(report: List[NodeTiming]) -> dict:
+    """Converts a run report into the Chrome trace event format (chrome://tracing, Perfetto)."""
+    origin = min((t.start for t in report), default=0.0)
+    events = [{'name': t.node_id, 'cat': t.node_class, 'ph': 'X', 'pid': t.process, 'tid': t.thread,
+               'ts': (t.start - origin) * 1e6, 'dur': t.wall * 1e6,
+               'args': {'cpu_s': t.cpu, 'peak_bytes': t.peak_bytes, 'output_bytes': t.output_bytes,
+                        'cached': t.cached}}
+              for t in report]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(report: List[NodeTiming], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(chrome_trace(report), f)
+
+
+def format_timing(timing: NodeTiming) -> str:
+    """节点耗时的简短说明，用于工作流图中的标注"""
+    if timing.cached:
+        return 'cached'
+    return f"{timing.wall * 1000:.1f} ms, peak {timing.peak_bytes / 1024**2:.1f} MB"
@@ -0,0 +1,15 @@
+from PySide6.QtCore import QObject, Signal
+
+
+class QtNodeSignals(QObject):
+    """
+    Qt adapter for a plain MTBaseNode: re-emits the node's finished signal as a Qt signal.
+    Create it in the GUI thread; slots connected to it then run in the GUI thread even when
+    the node finishes on a worker thread.
+    """
+    finished = Signal()
+
+    def __init__(self, node, parent=None):
+        super().__init__(parent)
+        self.node = node
+        node.finished.connect(self.finished.emit)
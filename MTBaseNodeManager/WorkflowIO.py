@@ -0,0 +1,90 @@
+import json
+from typing import Dict, Iterable, Optional
+from MTBaseNodeManager.BaseNodeManager import MTBaseNode, ConnectionManager
+
+# 工作流文件格式版本，2 在 1 的基础上增加了节点坐标和界面信息
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+
+
+def dump_workflow(conn_mgr: ConnectionManager, nodes: Optional[Iterable[MTBaseNode]] = None,
+                  ui: Optional[Dict[str, dict]] = None) -> dict:
+    """
+    Converts nodes and connections into a JSON-compatible dict:
+    {"version": 2,
+     "nodes": [{"id": ..., "class": ..., "label": ..., "params": {...}, "position": [x, y], ...}, ...],
+     "connections": [{"source": ..., "source_port": ..., "target": ..., "target_port": ...}, ...]}
+
+    Parameters:
+    conn_mgr (ConnectionManager): Source of the connections.
+    nodes (iterable): Nodes to record, defaults to the connected nodes of conn_mgr.
+    ui (dict): Optional {node id: extra fields}, e.g. the NodeGraphQt node type and name.
+    """
+    nodes = conn_mgr.nodes.values() if nodes is None else nodes
+    ui = ui or {}
+    entries = []
+    for node in nodes:
+        entry = {'id': node.id, 'class': type(node).__name__, 'label': node.label, 'params': node.params,
+                 'position': list(node.position)}
+        entry.update(ui.get(node.id, {}))
+        entries.append(entry)
+    connections = [{'source': c.source_node_id, 'source_port': c.source_port,
+                    'target': c.target_node_id, 'target_port': c.target_port}
+                   for c in conn_mgr.connections]
+    return {'version': FORMAT_VERSION, 'nodes': entries, 'connections': connections}
+
+
+def build_nodes(data: dict, node_classes: Dict[str, type]) -> Dict[str, MTBaseNode]:
+    """
+    Creates the nodes described by a workflow dict.
+
+    Parameters:
+    data (dict): Workflow description from dump_workflow or read_workflow.
+    node_classes (dict): {class name: node class}, e.g. MTP2Node.NODE_CLASSES.
+
+    Returns:
+    nodes (dict): {node id: node}, in file order.
+    """
+    nodes = {}
+    for entry in data['nodes']:
+        cls = node_classes.get(entry['class'])
+        if cls is None:
+            raise ValueError(f"Unknown node class: {entry['class']}")
+        node = cls(entry['id'], entry.get('label', entry['id']))
+        node.params.update(entry.get('params', {}))
+        node.position = tuple(entry.get('position', (0, 0)))
+        nodes[node.id] = node
+    return nodes
+
+
+def build_workflow(data: dict, node_classes: Dict[str, type]) -> ConnectionManager:
+    """Rebuilds the nodes and a ConnectionManager from a workflow dict."""
+    nodes = build_nodes(data, node_classes)
+    conn_mgr = ConnectionManager()
+    for c in data['connections']:
+        if c['source'] not in nodes or c['target'] not in nodes:
+            raise ValueError(f"Connection refers to an unknown node: {c['source']} -> {c['target']}")
+        if not conn_mgr.add_connection(nodes[c['source']], c['source_port'], nodes[c['target']], c['target_port']):
+            raise ValueError(f"Invalid connection: {c['source']}.{c['source_port']} -> {c['target']}.{c['target_port']}")
+    return conn_mgr
+
+
+def save_workflow(conn_mgr: ConnectionManager, path: str, nodes: Optional[Iterable[MTBaseNode]] = None,
+                  ui: Optional[Dict[str, dict]] = None):
+    """Writes a workflow to a compact JSON file, see dump_workflow for the arguments."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dump_workflow(conn_mgr, nodes, ui), f, ensure_ascii=False, separators=(',', ':'))
+
+
+def read_workflow(path: str) -> dict:
+    """Reads a JSON workflow file and checks its version."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported workflow version: {data.get('version')}")
+    return data
+
+
+def load_workflow(path: str, node_classes: Dict[str, type]) -> ConnectionManager:
+    """Reads a JSON workflow file and rebuilds its ConnectionManager."""
+    return build_workflow(read_workflow(path), node_classes)
@@ -0,0 +1,177 @@
+"""
+性能基准: 在合成的 Z_ALL_3D 文件上计时读取、计算、绘图和整个工作流，结果保存为 JSON。
+
+用法:
+    python MTBenchmark.py [--sizes 10x10 400x60 5000x200] [-r 5] [-o bench.json]
+    python MTBenchmark.py -o new.json --baseline bench.json   # 与基准比较，变慢超过容差时返回 1
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from MTProcessorClass.MTProcessor import MyDataProcessor
+from MTProcessorClass.MTCache import DatasetCache
+from MTProcessorClass.MTSynthetic import write_synthetic_dat
+from MTBaseNodeManager.BaseNodeManager import ConnectionManager, WorkflowEngine
+from MTP2Node import InputFileNode, PhaseTensorNode, ApparentResistivityNode, OutputApparentResistivityNode
+
+# 默认的 台站数x周期数 组合
+DEFAULT_SIZES = ['10x10', '400x60', '2000x100']
+RESULT_VERSION = 1
+
+
+def parse_size(text):
+    sites, sep, periods = text.lower().partition('x')
+    if not sep or not sites.isdigit() or not periods.isdigit():
+        raise argparse.ArgumentTypeError(f"expected SITESxPERIODS, got {text!r}")
+    return int(sites), int(periods)
+
+
+def measure(func, setup=None, repeat=5):
+    """
+    Times func(setup()) repeat times, the setup call is not timed. Output printed by func is discarded.
+
+    Returns:
+    times (list): Wall time of every run in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def build_workflow(path):
+    """Input -> PhaseTensor -> ApparentResistivity -> 单站视电阻率图，关闭结果缓存"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        input_node = InputFileNode('input', 'Input')
+        input_node.set_param('path', path)
+        input_node.set_param('read_start_line', 2)
+        input_node.set_param('use_cache', False)
+        phase_node = PhaseTensorNode('phase', 'Phase')
+        apparent_node = ApparentResistivityNode('apparent', 'Apparent')
+        output_node = OutputApparentResistivityNode('output', 'Output')
+        conn_mgr = ConnectionManager()
+        conn_mgr.add_connection(input_node, 'Processor', phase_node, 'Processor')
+        conn_mgr.add_connection(phase_node, 'Processor', apparent_node, 'Processor')
+        conn_mgr.add_connection(apparent_node, 'Processor', output_node, 'Processor')
+        engine = WorkflowEngine(conn_mgr, memoize=False)
+        engine.prepare_execution()
+    return engine
+
+
+def benchmark_size(path, repeat, cache_dir):
+    """
+    Runs every benchmark on one data file.
+
+    Returns:
+    results (dict): {benchmark name: list of wall times}.
+    """
+    def loaded():
+        MTP = MyDataProcessor()
+        MTP.read_file(path, read_start=2)
+        return MTP
+
+    base = loaded()
+    base.compute_apparent_resistivity()
+    cache = DatasetCache(cache_dir)
+    cache.invalidate()
+    cache.save(path, 'Z_ALL_3D', 2, loaded().DataFromDat)
+    engine = build_workflow(path)
+
+    def plot(MTP):
+        MTP.plot_resistivity_of_one_site(0)
+        MTP.fig.to_json()
+
+    return {
+        'read_file': measure(lambda MTP: MTP.read_file(path, read_start=2), MyDataProcessor, repeat),
+        'read_file_cached': measure(lambda MTP: MTP.read_file(path, read_start=2, cache=cache),
+                                    MyDataProcessor, repeat),
+        'get_distance': measure(lambda MTP: MTP.get_distance(), base.derive, repeat),
+        'compute_phase_Tensor': measure(lambda MTP: MTP.compute_phase_Tensor(), base.derive, repeat),
+        'compute_apparent_resistivity': measure(lambda MTP: MTP.compute_apparent_resistivity(),
+                                                base.derive, repeat),
+        'plot_resistivity_of_one_site': measure(plot, base.derive, repeat),
+        'workflow': measure(lambda _: engine.execute(), None, repeat),
+    }
+
+
+def compare(results, baseline, tolerance, min_time):
+    """
+    Returns the benchmarks whose fastest run is more than `tolerance` slower than in the baseline.
+    Benchmarks faster than min_time seconds in both runs are ignored as noise.
+    """
+    previous = {(r['name'], r['sites'], r['periods']): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        old = previous.get((r['name'], r['sites'], r['periods']))
+        if old is None or max(r['min'], old['min']) < min_time:
+            continue
+        ratio = r['min'] / old['min'] if old['min'] > 0 else float('inf')
+        if ratio > 1 + tolerance:
+            regressions.append((r, old, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the MT processing hot paths on synthetic data.')
+    parser.add_argument('--sizes', nargs='+', type=parse_size, default=[parse_size(s) for s in DEFAULT_SIZES],
+                        metavar='SITESxPERIODS', help=f"data sizes, default {' '.join(DEFAULT_SIZES)}")
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per benchmark')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--data-dir', help='keep the generated data files here and reuse them')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown of the fastest run against the baseline, default 0.25 (25%%)')
+    parser.add_argument('--min-time', type=float, default=0.005,
+                        help='ignore benchmarks faster than this many seconds when comparing')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        results = []
+        for sites, periods in args.sizes:
+            path = os.path.join(data_dir, f"synthetic_{sites}x{periods}.dat")
+            if not os.path.exists(path):
+                print(f"生成 {path}")
+                write_synthetic_dat(path, sites, periods)
+            for name, times in benchmark_size(path, args.repeat, os.path.join(tmp, 'cache')).items():
+                results.append({'name': name, 'sites': sites, 'periods': periods, 'repeat': len(times),
+                                'min': min(times), 'median': statistics.median(times),
+                                'mean': statistics.fmean(times), 'times': times})
+                print(f"{sites:>6}x{periods:<5}{name:<32}{statistics.median(times) * 1000:>10.2f} ms")
+
+    report = {'version': RESULT_VERSION, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_time)
+        for r, old, ratio in regressions:
+            print(f"性能下降: {r['name']} ({r['sites']}x{r['periods']}) "
+                  f"{old['min'] * 1000:.2f} ms -> {r['min'] * 1000:.2f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("未发现性能下降")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
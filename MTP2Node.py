@@ -1,6 +1,14 @@
 from MTBaseNodeManager.BaseNodeManager import MTBaseNode, ConnectionManager, WorkflowEngine
 from typing import Dict, List
-from MTProcessorClass.MTProcessor import MyDataProcessor as MTProcessor
+import os
+import numpy as np
+from MTProcessorClass.MTProcessor import MyDataProcessor as MTProcessor, TileStream, SECTION_PARAMETERS, \
+    ELLIPSE_COLORS
+from MTProcessorClass.MTCache import DatasetCache
+from MTProcessorClass.MTBatch import process_batch, expand_paths
+
+# 所有输入节点共用的已解析文件缓存
+dataset_cache = DatasetCache()
 
 # 将MTProcessor中的功能封装到Node中
 ## 1.输入节点
@@ -10,15 +18,51 @@ class InputFileNode(MTBaseNode):
         super().__init__(node_id, label)
         self.add_output_port('Processor', MTProcessor)
         self.set_param('path', '')
-        self.set_param('file_type', '')
+        self.set_param('file_type', 'Z_ALL_3D')
         self.set_param('read_start_line', 0)
+        self.set_param('use_cache', True)
+        self.set_param('storage_dir', '')  # 非空时数组保存为该目录下的内存映射文件
 
     def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
-        MTP = MTProcessor()
-        MTP.read_file(self.params['path'], self.params['file_type'], self.params['read_start_line'])
+        MTP = MTProcessor(storage_dir=self.params['storage_dir'] or None)
+        cache = dataset_cache if self.params['use_cache'] else None
+        MTP.read_file(self.params['path'], self.params['file_type'], self.params['read_start_line'], cache=cache,
+                      cancel_check=self.check_cancelled)
         MTP.get_distance()
         return {'Processor': MTP} 
 
+    def cache_token(self):
+        # 文件内容变化时重新读取
+        path = self.params['path']
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+## 1.2 批量文件输入节点
+class BatchInputFileNode(MTBaseNode):
+    def __init__(self, node_id: str, label: str):
+        super().__init__(node_id, label)
+        self.add_output_port('Processors', List)
+        self.add_output_port('Errors', Dict)
+        self.set_param('pattern', '')  # 目录或 glob 模式
+        self.set_param('file_type', 'Z_ALL_3D')
+        self.set_param('read_start_line', 0)
+        self.set_param('max_workers', None)  # None 表示每个 CPU 核一个进程
+        self.set_param('use_cache', True)
+
+    def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
+        # 每个文件在独立进程中完成读取和计算，单个文件失败不影响其他文件
+        results = process_batch(self.params['pattern'], self.params['file_type'], self.params['read_start_line'],
+                                max_workers=self.params['max_workers'], use_cache=self.params['use_cache'],
+                                cancel_check=self.check_cancelled)
+        return {'Processors': [r.processor for r in results if r.ok],
+                'Errors': {r.path: r.error for r in results if not r.ok}}
+
+    def cache_token(self):
+        # 文件列表或任一文件变化时重新处理
+        return [(path, os.stat(path).st_mtime_ns) for path in expand_paths(self.params['pattern'])]
+
 
 ## 2.计算节点
 ## 2.1 相位张量计算节点
@@ -27,10 +71,17 @@ class PhaseTensorNode(MTBaseNode):
         super().__init__(node_id, label)
         self.add_input_port('Processor', MTProcessor)
         self.add_output_port('Processor', MTProcessor)
+        self.add_output_port('Tiles', TileStream)
+        self.set_param('streaming', False)  # True 时只输出按块惰性计算的 Tiles，不生成完整数组
+        self.set_param('period_tile', 16)
+        self.set_param('site_tile', 256)
     def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
-        MTP = inputs['Processor']
-        MTP.compute_phase_Tensor()
-        return {'Processor': MTP}
+        # 在共享数据的新视图上计算，不修改上游的处理器
+        MTP = inputs['Processor'].derive()
+        if not self.params['streaming']:
+            MTP.compute_phase_Tensor(cancel_check=self.check_cancelled)
+        tiles = MTP.stream_phase_Tensor(self.params['period_tile'], self.params['site_tile'])
+        return {'Processor': MTP, 'Tiles': tiles}
 
 ## 2.2 视电阻率计算节点
 class ApparentResistivityNode(MTBaseNode):
@@ -38,10 +89,17 @@ class ApparentResistivityNode(MTBaseNode):
         super().__init__(node_id, label)
         self.add_input_port('Processor', MTProcessor)
         self.add_output_port('Processor', MTProcessor)
+        self.add_output_port('Tiles', TileStream)
+        self.set_param('streaming', False)  # True 时只输出按块惰性计算的 Tiles，不生成完整数组
+        self.set_param('period_tile', 16)
+        self.set_param('site_tile', 256)
     def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
-        MTP = inputs['Processor']
-        MTP.compute_apparent_resistivity()
-        return {'Processor': MTP}
+        # 在共享数据的新视图上计算，不修改上游的处理器
+        MTP = inputs['Processor'].derive()
+        if not self.params['streaming']:
+            MTP.compute_apparent_resistivity(cancel_check=self.check_cancelled)
+        tiles = MTP.stream_apparent_resistivity(self.params['period_tile'], self.params['site_tile'])
+        return {'Processor': MTP, 'Tiles': tiles}
     
 ## 2.3 文件数据拆包节点
 class UnpackDataNode(MTBaseNode):
@@ -109,19 +167,116 @@ class OutputApparentResistivityNode(MTBaseNode):
     def __init__(self, node_id: str, label: str):
         super().__init__(node_id, label)
         self.add_input_port('Processor', MTProcessor)
+        self.add_input_port('Tiles', TileStream)  # 可选，连接后从分块结果中取出当前台站
         self.site_index = 0
+        self.tiles = None
+        self.set_param('show_phase', False)  # 在视电阻率下方绘制相位
+        self.set_param('error_bars', True)
+    def cache_token(self):
+        return self.site_index
     def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
         MTP = inputs['Processor']
-        MTP.plot_resistivity_of_one_site(self.site_index)
-        self.MTP = MTP
-        self.restorefigure = MTP.fig
+        self.MTP = MTP.derive()  # 绘图结果 fig 保存在自己的视图上
+        self.tiles = inputs.get('Tiles')
+        # 新数据的台站数可能变少，将台站序号限制在范围内
+        self.set_site_index(self.site_index)
+        self.plot()
+        return {'Processor': MTP}
+    def execute_and_emit(self):
+        self.plot()
+        self.finished.emit()
+    @property
+    def n_sites(self) -> int:
+        MTP = getattr(self, 'MTP', None)
+        return 0 if MTP is None or MTP.DataFromDat is None else MTP.DataFromDat.nSites
+    def set_site_index(self, index: int) -> bool:
+        """设置当前台站，超出范围时限制在 [0, n_sites - 1]，返回台站是否改变"""
+        index = min(max(int(index), 0), max(self.n_sites - 1, 0))
+        changed = index != self.site_index
+        self.site_index = index
+        return changed
+    def select_site(self, name: str) -> bool:
+        """按台站名设置当前台站，返回台站是否改变"""
+        return self.set_site_index(self.MTP.site_locator().index_of(name))
+    def select_nearest_site(self, x: float, y: float) -> bool:
+        """设置距离 (x, y) (ModEM 坐标，m) 最近的台站为当前台站，返回台站是否改变"""
+        sites, _ = self.MTP.site_locator().nearest(x, y)
+        return self.set_site_index(sites[0])
+    def plot(self):
+        self.MTP.fig = self.restorefigure = self.site_figure(self.site_index)
         print('fig success')
+    def site_figure(self, site_index: int):
+        """构建指定台站的图，不修改当前台站和 restorefigure，可在后台线程中调用"""
+        if not 0 <= site_index < self.n_sites:
+            raise ValueError(f"Site index {site_index} is out of range [0, {self.n_sites}).")
+        MTP = self.MTP.derive()
+        curves = None if self.tiles is None else self.gather_site(self.tiles, site_index)
+        MTP.plot_resistivity_of_one_site(site_index, curves, show_phase=self.params['show_phase'],
+                                         error_bars=self.params['error_bars'])
+        return MTP.fig
+    def gather_site(self, tiles: TileStream, site_index: int = None) -> dict:
+        """只计算包含该台站 (默认当前台站) 的块，拼出该台站 [nTx, 2, 2] 的视电阻率、相位及误差"""
+        site_index = self.site_index if site_index is None else site_index
+        curves = {}
+        for ps, ss, result in tiles.for_site(site_index):
+            for key, value in result.items():
+                if key not in curves:
+                    curves[key] = np.full([self.MTP.DataFromDat.nTx, 2, 2], np.nan)
+                curves[key][ps] = value[:, site_index - ss.start]
+        return curves
+
+
+## 3.4 拟断面输出节点
+class OutputPseudoSectionNode(MTBaseNode):
+    PARAMETERS = list(SECTION_PARAMETERS)
+    COMPONENTS = ['xx', 'xy', 'yx', 'yy']
+    def __init__(self, node_id: str, label: str):
+        super().__init__(node_id, label)
+        self.add_input_port('Processor', MTProcessor)
+        self.set_param('parameter', 'skew')  # 绘制的参数，见 PARAMETERS
+        self.set_param('component', 'xy')  # 视电阻率和相位的分量
+    def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
+        MTP = inputs['Processor']
+        self.MTP = MTP.derive()  # 测线距离和绘图结果保存在自己的视图上
+        self.plot()
         return {'Processor': MTP}
     def execute_and_emit(self):
-        self.MTP.plot_resistivity_of_one_site(self.site_index)
+        self.plot()
+        self.finished.emit()
+    def plot(self):
+        self.MTP.plot_pseudo_section(self.params['parameter'], self.params['component'])
         self.restorefigure = self.MTP.fig
-        print('fig success')
+
+## 3.5 相位张量椭圆输出节点
+class OutputPhaseTensorEllipseNode(MTBaseNode):
+    MODES = ['map', 'section']
+    COLORS = list(ELLIPSE_COLORS)
+    def __init__(self, node_id: str, label: str):
+        super().__init__(node_id, label)
+        self.add_input_port('Processor', MTProcessor)
+        self.set_param('mode', 'map')  # map: 单个周期的平面图，section: 所有周期的拟断面
+        self.set_param('period_index', 0)  # map 模式绘制的周期
+        self.set_param('color', 'PT_phimin')
+        self.set_param('scale', 1.0)
+    def execute(self, inputs: Dict[str, any]) -> Dict[str, any]:
+        MTP = inputs['Processor']
+        self.MTP = MTP.derive()
+        self.plot()
+        return {'Processor': MTP}
+    def execute_and_emit(self):
+        self.plot()
         self.finished.emit()
+    def plot(self):
+        self.MTP.plot_phase_tensor_ellipses(self.params['period_index'], self.params['mode'], self.params['color'],
+                                            scale=self.params['scale'])
+        self.restorefigure = self.MTP.fig
+
+
+## 节点类型注册表，按类名查找节点类 (用于工作流文件的加载)
+NODE_CLASSES = {cls.__name__: cls for cls in (
+    InputFileNode, BatchInputFileNode, PhaseTensorNode, ApparentResistivityNode, UnpackDataNode,
+    OutputMTPNode, OutputFormatNode, OutputApparentResistivityNode, OutputPseudoSectionNode,
+    OutputPhaseTensorEllipseNode)}
 
 
 ## 4.测试
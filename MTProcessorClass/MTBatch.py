@@ -0,0 +1,95 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Optional
+from MTProcessorClass.MTProcessor import MyDataProcessor
+from MTProcessorClass.MTCache import DatasetCache
+
+# 目录模式下收集的文件后缀
+DATA_SUFFIXES = ('.dat',)
+
+
+@dataclass
+class BatchResult:
+    path: str
+    processor: Optional[MyDataProcessor] = None
+    error: Optional[str] = None  # 失败时的错误信息
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def expand_paths(pattern: str) -> List[str]:
+    """
+    Returns the sorted data files selected by a directory or a glob pattern.
+    A directory selects every file with a suffix in DATA_SUFFIXES directly inside it.
+    """
+    if os.path.isdir(pattern):
+        return sorted(os.path.join(pattern, name) for name in os.listdir(pattern)
+                      if name.lower().endswith(DATA_SUFFIXES) and os.path.isfile(os.path.join(pattern, name)))
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def process_file(file_path: str, file_type: str = 'Z_ALL_3D', read_start: int = 0,
+                 phase_tensor: bool = True, apparent_resistivity: bool = True,
+                 use_cache: bool = True) -> MyDataProcessor:
+    """
+    Parses one file and runs the requested computations, used as the worker of process_batch.
+    """
+    MTP = MyDataProcessor()
+    MTP.read_file(file_path, file_type, read_start, cache=DatasetCache() if use_cache else None)
+    MTP.get_distance()
+    if phase_tensor:
+        MTP.compute_phase_Tensor()
+    if apparent_resistivity:
+        MTP.compute_apparent_resistivity()
+    return MTP
+
+
+def process_batch(pattern, file_type: str = 'Z_ALL_3D', read_start: int = 0, max_workers: Optional[int] = None,
+                  cancel_check=None, **kwargs) -> List[BatchResult]:
+    """
+    Runs process_file for every selected file on a process pool.
+
+    Parameters:
+    pattern (str or list): Directory, glob pattern, or an explicit list of file paths.
+    max_workers (int): Number of worker processes, None for one per CPU core, 1 runs in this process.
+    cancel_check (callable): Optional, called before each file is collected. When it raises, files that have
+                             not started are cancelled and the exception propagates.
+    kwargs: Passed on to process_file.
+
+    Returns:
+    results (list): One BatchResult per file, in the order of the file list. A failing file only sets
+                    its own error and does not stop the batch.
+    """
+    paths = expand_paths(pattern) if isinstance(pattern, str) else list(pattern)
+    check = cancel_check or (lambda: None)
+    if max_workers == 1:
+        results = []
+        for path in paths:
+            check()
+            results.append(_result(path, partial(process_file, path, file_type, read_start, **kwargs)))
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_file, path, file_type, read_start, **kwargs) for path in paths]
+        results = []
+        try:
+            for path, future in zip(paths, futures):
+                check()
+                results.append(_result(path, future.result))
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        return results
+
+
+def _result(path: str, call) -> BatchResult:
+    """Runs call() and wraps its processor or its exception into a BatchResult."""
+    try:
+        return BatchResult(path, processor=call())
+    except Exception as e:
+        return BatchResult(path, error=f"{type(e).__name__}: {e}")
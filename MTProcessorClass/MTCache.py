@@ -0,0 +1,156 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+import numpy as np
+from MTProcessorClass.MTDataset import MTDataset
+
+# 缓存目录默认位置，可通过环境变量 MTQT_CACHE_DIR 修改
+DEFAULT_CACHE_DIR = os.environ.get('MTQT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'MTQT'))
+# 缓存目录的默认容量上限 (字节)
+DEFAULT_MAX_BYTES = 2 * 1024**3
+# 分段复制缓存中的阻抗时每段的大小 (字节)
+_COPY_CHUNK = 32 * 1024**2
+# MTDataset 中需要保存的字符串字段
+_META_FIELDS = ('dataType', 'signstr', 'typeUnits', 'orientation', 'origin')
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _read_member(archive, name, allocate, key):
+    """
+    Copies the array stored as name.npy in an .npz archive into allocate(key, shape, dtype), piece by piece,
+    so the array is never held in memory as a whole.
+    """
+    with archive.open(name + '.npy') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        if fortran_order or dtype.hasobject:
+            raise ValueError(f"Unexpected layout of {name} in the cache entry.")
+        out = allocate(key, shape, dtype)
+        flat = out.reshape(-1)
+        step = max(_COPY_CHUNK // dtype.itemsize, 1)
+        for start in range(0, flat.size, step):
+            count = min(step, flat.size - start)
+            flat[start:start + count] = np.frombuffer(f.read(count * dtype.itemsize), dtype=dtype, count=count)
+    return out
+
+
+class DatasetCache:
+    """
+    Persistent .npz cache of parsed survey files.
+
+    An entry is keyed by the file's absolute path, size and mtime together with file_type and read_start,
+    so editing the file automatically misses the old entry. The directory is kept under max_bytes by
+    evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, file_path, file_type, read_start):
+        """Returns the cache file for the current state of file_path, None if the file does not exist."""
+        if not os.path.exists(file_path):
+            return None
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        key = f"{stat.st_size}|{stat.st_mtime_ns}|{file_type}|{read_start}"
+        # 文件名以路径的哈希开头，便于按文件失效
+        return os.path.join(self.cache_dir, f"{_digest(path)}-{_digest(key)}.npz")
+
+    def load(self, file_path, file_type, read_start, allocate=None):
+        """
+        Returns the cached MTDataset for the file, or None on a cache miss.
+
+        Parameters:
+        allocate (callable): Optional allocate(key, shape, dtype) returning the arrays that receive Z_matrix and
+                             Zerr_matrix, e.g. memory-mapped files. They are then filled piece by piece.
+        """
+        entry = self._entry_path(file_path, file_type, read_start)
+        if entry is None or not os.path.exists(entry):
+            return None
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                if allocate is None:
+                    Z, Zerr = npz['Z'], npz['Zerr']
+                else:
+                    Z = _read_member(npz.zip, 'Z', allocate, 'Z_matrix')
+                    Zerr = _read_member(npz.zip, 'Zerr', allocate, 'Zerr_matrix')
+                dataset = MTDataset(npz['periods'], npz['sitenames'].tolist(), npz['xyz'], Z, Zerr,
+                                    header=npz['header'].tolist(),
+                                    **{field: str(npz[field]) for field in _META_FIELDS})
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            # 损坏的缓存文件 (包括空文件和不完整的 zip) 直接丢弃
+            self._remove(entry)
+            return None
+        # 更新访问时间，用于 LRU 淘汰
+        os.utime(entry)
+        return dataset
+
+    def save(self, file_path, file_type, read_start, dataset):
+        """
+        Stores the parsed MTDataset for the file and evicts old entries if the cache is too large.
+        """
+        entry = self._entry_path(file_path, file_type, read_start)
+        if entry is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 写入临时文件后再替换，避免留下不完整的缓存；每次写入使用唯一的临时文件，多线程、多进程可同时写入
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=os.path.basename(entry) + '.', suffix='.tmp.npz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, periods=dataset.periods, sitenames=np.array(dataset.sitenames, dtype=str),
+                         xyz=dataset.xyz, Z=dataset.Z, Zerr=dataset.Zerr, header=np.array(dataset.header, dtype=str),
+                         **{field: np.array(getattr(dataset, field), dtype=str) for field in _META_FIELDS})
+            os.replace(tmp, entry)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+
+    def invalidate(self, file_path=None):
+        """
+        Removes all entries of file_path, or the whole cache when file_path is None.
+        Returns the number of removed entries.
+        """
+        prefix = '' if file_path is None else _digest(os.path.abspath(file_path)) + '-'
+        removed = 0
+        for name, _, _ in self._entries():
+            if name.startswith(prefix):
+                removed += self._remove(os.path.join(self.cache_dir, name))
+        return removed
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for name, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def _entries(self):
+        """Returns (name, size, last access) of every cache entry."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for item in os.scandir(self.cache_dir):
+            if item.is_file() and item.name.endswith('.npz') and not item.name.endswith('.tmp.npz'):
+                stat = item.stat()
+                entries.append((item.name, stat.st_size, stat.st_mtime))
+        return entries
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
@@ -0,0 +1,109 @@
+from collections.abc import MutableMapping
+import numpy as np
+
+# 字典视图中的键与 MTDataset 属性的对应关系
+_FIELDS = {'header': 'header', 'T': 'periods', 'Sitenames': 'sitenames', 'XYZ': 'xyz',
+           'Z_matrix': 'Z', 'Zerr_matrix': 'Zerr', 'dataType': 'dataType', 'signstr': 'signstr',
+           'typeUnits': 'typeUnits', 'orientation': 'orientation', 'origin': 'origin'}
+# 由数组形状推导出的只读键
+_DERIVED = ('nTx', 'nSites')
+
+
+class MTDataset(MutableMapping):
+    """
+    Typed container for one MT data block.
+
+    Periods, coordinates and impedances are held as contiguous float64/complex128 arrays, computed results
+    (skew, Phi2, Apparent_resistivity, ...) are kept in `results`. The object also behaves like the old
+    DataFromDat dict, e.g. dataset['T'] returns the periods and dataset.update({...}) stores results.
+    """
+    __slots__ = ('header', 'dataType', 'signstr', 'typeUnits', 'orientation', 'origin',
+                 'periods', 'sitenames', 'site_index', 'xyz', 'Z', 'Zerr', 'results')
+
+    def __init__(self, periods, sitenames, xyz, Z, Zerr, header=None, dataType='', signstr='',
+                 typeUnits='', orientation='', origin=''):
+        """
+        Parameters:
+        periods (array-like): Periods in seconds, shape [nTx].
+        sitenames (list): Site codes, shape [nSites].
+        xyz (array-like): Site coordinates, shape [nSites, 3].
+        Z (numpy.ndarray): Complex impedance tensors, shape [nTx, nSites, 2, 2].
+        Zerr (numpy.ndarray): Impedance errors, shape [nTx, nSites, 2, 2].
+        """
+        self.header = header if header is not None else []
+        self.dataType = dataType
+        self.signstr = signstr
+        self.typeUnits = typeUnits
+        self.orientation = orientation
+        self.origin = origin
+        self.periods = np.ascontiguousarray(periods, dtype=np.float64)
+        self.sitenames = list(sitenames)
+        self.site_index = {name: i for i, name in enumerate(self.sitenames)}
+        self.xyz = np.ascontiguousarray(xyz, dtype=np.float64).reshape(-1, 3)
+        self.Z = np.ascontiguousarray(Z, dtype=np.complex128)
+        self.Zerr = np.ascontiguousarray(Zerr, dtype=np.float64)
+        self.results = {}
+
+    @property
+    def nTx(self):
+        return self.Z.shape[0]
+
+    @property
+    def nSites(self):
+        return self.Z.shape[1]
+
+    @property
+    def nbytes(self):
+        """Total size of the arrays held by the dataset, including computed results."""
+        return sum(value.nbytes for value in (self.periods, self.xyz, self.Z, self.Zerr, *self.results.values())
+                   if isinstance(value, np.ndarray))
+
+    # 兼容 DataFromDat 字典的访问方式
+    def __getitem__(self, key):
+        if key in _FIELDS:
+            return getattr(self, _FIELDS[key])
+        if key in _DERIVED:
+            return getattr(self, key)
+        return self.results[key]
+
+    def __setitem__(self, key, value):
+        if key in _DERIVED:
+            raise KeyError(f"{key} is derived from Z_matrix and cannot be set.")
+        if key == 'Sitenames':
+            self.sitenames = list(value)
+            self.site_index = {name: i for i, name in enumerate(self.sitenames)}
+        elif key in _FIELDS:
+            setattr(self, _FIELDS[key], value)
+        else:
+            self.results[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELDS or key in _DERIVED:
+            raise KeyError(f"{key} cannot be removed from the dataset.")
+        del self.results[key]
+
+    def __iter__(self):
+        yield from _FIELDS
+        yield from _DERIVED
+        yield from self.results
+
+    def __len__(self):
+        return len(_FIELDS) + len(_DERIVED) + len(self.results)
+
+    def copy(self):
+        """
+        Returns a new dataset that shares every array with this one and has its own results dict.
+        The shared arrays are made read-only, so results added to either dataset never affect the other
+        and no large array is copied.
+        """
+        new = object.__new__(MTDataset)
+        for name in self.__slots__:
+            setattr(new, name, getattr(self, name))
+        new.results = dict(self.results)
+        for value in (self.periods, self.xyz, self.Z, self.Zerr, *self.results.values()):
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+        return new
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} nTx={self.nTx} nSites={self.nSites} keys={list(self)}>"
@@ -1,264 +1,834 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
-import copy
+from functools import partial
+import bisect
+import io
 import os
+import re
+import shutil
+import tempfile
+import threading
+import weakref
 import plotly.graph_objects as go
+from MTProcessorClass.MTDataset import MTDataset
+from MTProcessorClass.MTProfile import project_profile
+from MTProcessorClass.MTSpatial import SiteLocator
+
+# Z_ALL_3D 数据块的列定义，site/分量保留字符串，数值列直接解析为 float64
+_DATA_COLUMNS = ['period', 'site_code', 'lat', 'lon', 'x', 'y', 'z', 'comp', 'real', 'imag', 'err', 'Amuth']
+_DATA_DTYPES = {'period': np.float64, 'site_code': str, 'lat': np.float64, 'lon': np.float64,
+                'x': np.float64, 'y': np.float64, 'z': np.float64, 'comp': str,
+                'real': np.float64, 'imag': np.float64, 'err': np.float64, 'Amuth': str}
+# 阻抗分量在 2x2 张量中的展平位置
+_COMP_INDEX = {'ZXX': 0, 'ZXY': 1, 'ZYX': 2, 'ZYY': 3}
+# 索引时记录的行: '>' 块头行、注释行和空行，数据块在遇到其中任意一行时结束
+_MARK_LINE = re.compile(rb'^[ \t]*(?:[#>][^\n]*|\r?)$', re.M)
+# 单站曲线的键，与 apparent_resistivity 的输出一致
+_CURVE_KEYS = ('Apparent_resistivity', 'Phi', 'Apparent_resistivity_err', 'Phi_err')
+# 单站曲线图中各分量的 (行, 列): (名称后缀, 颜色)
+_CURVE_STYLES = {(0, 0): ('xx', 'green'), (0, 1): ('xy', 'red'), (1, 0): ('yx', 'blue'), (1, 1): ('yy', 'yellow')}
+# 拟断面可绘制的参数及其颜色条标题，[nTx, nSites, 2, 2] 的参数需指定分量
+SECTION_PARAMETERS = {'skew': 'Skew (deg)', 'Phi2': 'Phi2 (deg)', 'PT_phimin': 'Phi min (deg)',
+                       'PT_phimax': 'Phi max (deg)', 'PT_beta': 'Beta (deg)',
+                       'Apparent_resistivity': 'log10 Apparent Resistivity (Ohm.m)', 'Phi': 'Phase (deg)'}
+# 相位张量椭圆可用的着色参数
+ELLIPSE_COLORS = {'PT_phimin': 'Phi min (deg)', 'PT_beta': 'Beta (deg)', 'skew': 'Skew (deg)', 'Phi2': 'Phi2 (deg)'}
+# 相位张量椭圆拟断面中椭圆数量的默认上限，超过时按台站均匀抽稀
+MAX_ELLIPSES = 20000
+# 数据文件的块索引，所有处理器共用: {(绝对路径, 大小, mtime_ns): 块列表}，每个文件只保留最新的索引
+_BLOCK_INDEX = {}
+_BLOCK_INDEX_LOCK = threading.Lock()  # 多个线程可能同时索引同一个文件
+# 分段扫描、解析数据文件时每段的大小 (字节)
+_READ_CHUNK = 32 * 1024**2
+# file_type 与 ModEM 数据块类型的对应关系
+_FILE_TYPES = {'Z_ALL_3D': 'Full_Impedance', 'Z_offdiag_3D': 'Off_Diagonal_Impedance'}
+
+def phase_tensor(Z_matrix):
+    """
+    Computes the phase tensor and its invariants for a stack of impedance tensors at once.
+    Elements whose Re(Z) is singular are returned as NaN instead of raising.
+    
+    Parameters:
+    Z_matrix (numpy.ndarray): Complex impedance tensors, shape [..., 2, 2].
+    
+    Returns:
+    result (dict): 'Phase_Tensor' [..., 2, 2], 'skew' and 'Phi2' in degrees as before, and the invariants
+                   'PT_alpha', 'PT_beta', 'PT_phimin', 'PT_phimax' in degrees plus the ellipse axes 'PT_major', 'PT_minor'.
+    """
+    X = np.real(Z_matrix)
+    Y = np.imag(Z_matrix)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Phase_Tensor = inv(real(Z_tensor))*imag(Z_tensor)，2x2 逆矩阵使用解析式
+        det = X[..., 0, 0] * X[..., 1, 1] - X[..., 0, 1] * X[..., 1, 0]
+        singular = (det == 0) | ~np.isfinite(det)
+        det = np.where(singular, np.nan, det)
+        X_inv = np.empty_like(X)
+        X_inv[..., 0, 0] = X[..., 1, 1] / det
+        X_inv[..., 0, 1] = -X[..., 0, 1] / det
+        X_inv[..., 1, 0] = -X[..., 1, 0] / det
+        X_inv[..., 1, 1] = X[..., 0, 0] / det
+        Phase_Tensor = np.matmul(X_inv, Y)
+
+        Pxx = Phase_Tensor[..., 0, 0]
+        Pxy = Phase_Tensor[..., 0, 1]
+        Pyx = Phase_Tensor[..., 1, 0]
+        Pyy = Phase_Tensor[..., 1, 1]
+        rot_angle = 1/4 * np.arctan2(2 * (Pxx - Pyy) * (Pxy + Pyx), (Pxx - Pyy)**2 - (Pxy + Pyx)**2)
+        cos, sin = np.cos(rot_angle), np.sin(rot_angle)
+        rot_M = np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=-2)
+        phi = np.matmul(np.matmul(rot_M, Phase_Tensor), np.swapaxes(rot_M, -1, -2))
+
+        Phi2 = np.degrees(np.arctan(np.sqrt(np.abs(phi[..., 0, 0] * phi[..., 1, 1] - phi[..., 0, 1] * phi[..., 1, 0]))))
+        skew = np.degrees(1/2 * np.arctan(np.abs((phi[..., 0, 1] - phi[..., 1, 0]) / (phi[..., 0, 0] + phi[..., 1, 1]))))
+
+        # 相位张量不变量 (Caldwell et al., 2004)
+        beta = 1/2 * np.arctan2(Pxy - Pyx, Pxx + Pyy)
+        alpha = 1/2 * np.arctan2(Pxy + Pyx, Pxx - Pyy)
+        circle = np.hypot((Pxx + Pyy) / 2, (Pxy - Pyx) / 2)
+        ellipse = np.hypot((Pxx - Pyy) / 2, (Pxy + Pyx) / 2)
+        major = circle + ellipse
+        minor = circle - ellipse
+    return {'Phase_Tensor': Phase_Tensor, 'skew': skew, 'Phi2': Phi2,
+            'PT_alpha': np.degrees(alpha), 'PT_beta': np.degrees(beta),
+            'PT_phimin': np.degrees(np.arctan(minor)), 'PT_phimax': np.degrees(np.arctan(major)),
+            'PT_major': major, 'PT_minor': minor}
+
+def apparent_resistivity(Z_matrix, T, Zerr_matrix=None, dtype=np.float64):
+    """
+    Computes apparent resistivity and phase for a stack of impedance tensors at once.
+    
+    Parameters:
+    Z_matrix (numpy.ndarray): Complex impedance tensors, shape [nTx, ..., 2, 2].
+    T (numpy.ndarray): Periods in seconds, shape [nTx].
+    Zerr_matrix (numpy.ndarray): Optional impedance errors with the same shape as Z_matrix.
+    dtype: Output dtype, e.g. np.float32 to halve the memory of the outputs.
+    
+    Returns:
+    result (dict): 'Apparent_resistivity' (0.2*T*|Z|^2) and 'Phi' (angle(Z) in radians); when Zerr_matrix is given
+                   also 'Apparent_resistivity_err' (0.4*T*|Z|*dZ) and 'Phi_err' (arcsin(dZ/|Z|), at most pi/2).
+    """
+    # 周期沿第一维广播
+    T = np.asarray(T, dtype=float).reshape((-1,) + (1,) * (np.ndim(Z_matrix) - 1))
+    absZ = np.abs(Z_matrix)
+    result = {'Apparent_resistivity': (0.2 * T * absZ**2).astype(dtype, copy=False),
+              'Phi': np.angle(Z_matrix).astype(dtype, copy=False)}
+    if Zerr_matrix is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel_err = np.minimum(Zerr_matrix / absZ, 1)
+        result['Apparent_resistivity_err'] = (0.4 * T * absZ * Zerr_matrix).astype(dtype, copy=False)
+        result['Phi_err'] = np.arcsin(rel_err).astype(dtype, copy=False)
+    return result
+
+def _log_range(values, pad=0.1):
+    """对数坐标轴的范围 [log10(min) - pad, log10(max) + pad]，忽略非正值和 NaN"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values) & (values > 0)]
+    if values.size == 0:
+        return None
+    return [np.log10(values.min()) - pad, np.log10(values.max()) + pad]
+
+def _linear_range(values, pad=0.05):
+    """线性坐标轴的范围，两端各留 pad 倍的数据跨度"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return None
+    span = max(values.max() - values.min(), 1.0)
+    return [values.min() - pad * span, values.max() + pad * span]
+
+def ellipse_outlines(centre_x, centre_y, major, minor, angle, n_points=32, scale_x=1.0, scale_y=1.0):
+    """
+    Generates the outlines of many ellipses at once, separated by NaN so they can be drawn as one line trace.
+
+    Parameters:
+    centre_x, centre_y (numpy.ndarray): Ellipse centres, shape [n].
+    major, minor (numpy.ndarray): Semi-axes, shape [n].
+    angle (numpy.ndarray): Direction of the major axis in radians, measured from the vertical (north) axis
+                           towards the horizontal (east) axis, shape [n].
+    n_points (int): Points per outline.
+    scale_x, scale_y (float): Factors applied to the outline offsets along each plot axis.
+
+    Returns:
+    x, y (numpy.ndarray): Coordinates, shape [n * (n_points + 2)]; each outline is closed and followed by NaN.
+    """
+    theta = np.linspace(0, 2 * np.pi, n_points + 1)
+    u = np.asarray(major, dtype=float)[:, None] * np.cos(theta)
+    v = np.asarray(minor, dtype=float)[:, None] * np.sin(theta)
+    sin, cos = np.sin(angle)[:, None], np.cos(angle)[:, None]
+    x = np.empty((len(u), n_points + 2))
+    y = np.empty((len(u), n_points + 2))
+    x[:, :-1] = np.asarray(centre_x, dtype=float)[:, None] + (u * sin + v * cos) * scale_x
+    y[:, :-1] = np.asarray(centre_y, dtype=float)[:, None] + (u * cos - v * sin) * scale_y
+    x[:, -1] = y[:, -1] = np.nan
+    return x.ravel(), y.ravel()
+
+def _line_chunks(cfile, start, end, size):
+    """
+    Yields (offset, data) pieces of the byte range [start, end) of a file, about size bytes each.
+    Every piece ends at a line break except possibly the last one, so no line is split between pieces.
+    """
+    with open(cfile, 'rb') as f:
+        f.seek(start)
+        offset, position, rest = start, start, b''
+        while position < end:
+            data = f.read(min(size, end - position))
+            if not data:
+                break
+            position += len(data)
+            data = rest + data
+            cut = data.rfind(b'\n') + 1 if position < end else len(data)
+            if cut:
+                yield offset, data[:cut]
+                offset += cut
+            rest = data[cut:]
+        if rest:
+            yield offset, rest
+
+class _ImpedanceAssembler:
+    """
+    Scatters parsed Z_ALL_3D rows into preallocated [nTx, nSites, 2, 2] arrays, one DataFrame chunk at a time.
+    Periods and sites are numbered in order of first appearance across all chunks, like pd.factorize of the
+    whole block, so no chunk has to be kept after it has been added.
+    """
+    def __init__(self, Z_matrix, Zerr_matrix):
+        self.Z_matrix = Z_matrix
+        self.Zerr_matrix = Zerr_matrix
+        self.periods = {}  # 周期 -> 序号
+        self.sites = {}  # 台站名 -> 序号
+        self.xyz = []  # 每个台站第一行的坐标
+
+    @staticmethod
+    def _codes(column, index, limit, name):
+        """
+        Factorizes one chunk and converts its codes into numbers over the whole block.
+
+        Returns:
+        codes (numpy.ndarray): Number of every row.
+        new_rows (list): First row of every value seen for the first time.
+        """
+        codes, uniques = pd.factorize(column)
+        new = [j for j, value in enumerate(uniques) if value not in index]
+        new_rows = []
+        if new:
+            _, first_row = np.unique(codes, return_index=True)
+            for j in new:
+                index[uniques[j]] = len(index)
+                new_rows.append(first_row[j])
+        if len(index) > limit:
+            raise ValueError(f"The block has more {name} than the {limit} declared in its header.")
+        return np.fromiter((index[value] for value in uniques), dtype=np.int64, count=len(uniques))[codes], new_rows
+
+    def add(self, data_df):
+        nTx, nSites = self.Z_matrix.shape[:2]
+        Tn, _ = self._codes(data_df['period'], self.periods, nTx, 'periods')
+        Sn, new_rows = self._codes(data_df['site_code'], self.sites, nSites, 'sites')
+        # 每个台站取其第一行的坐标
+        self.xyz.extend(data_df[['x', 'y', 'z']].iloc[new_rows].to_numpy())
+        Cn = data_df['comp'].map(_COMP_INDEX)
+        if Cn.isna().any():
+            unknown = data_df['comp'][Cn.isna()].iloc[0]
+            raise ValueError(f"Unknown component: {unknown}")
+        row, col = np.divmod(Cn.to_numpy(dtype=int), 2)
+        self.Z_matrix[Tn, Sn, row, col] = data_df['real'].to_numpy() + 1j * data_df['imag'].to_numpy()
+        self.Zerr_matrix[Tn, Sn, row, col] = data_df['err'].to_numpy()
+
+    def result(self):
+        """Returns T, Sitenames and XYZ in order of first appearance."""
+        return np.array(list(self.periods), dtype=np.float64), list(self.sites), np.array(self.xyz).reshape(-1, 3)
+
+def _phase_tensor_tile(Z_matrix, ps, ss):
+    return phase_tensor(Z_matrix[ps, ss])
+
+def _apparent_resistivity_tile(Z_matrix, T, Zerr_matrix, dtype, ps, ss):
+    return apparent_resistivity(Z_matrix[ps, ss], T[ps], Zerr_matrix[ps, ss], dtype=dtype)
+
+class TileStream:
+    """
+    Re-iterable stream of (period_slice, site_slice, result) tiles.
+    Each tile is computed only when it is reached, so a consumer that does not keep the results
+    needs memory proportional to one tile. Every iteration recomputes the tiles from the start.
+    compute is a partial of a module-level function so streams can be pickled for process pools.
+    """
+
+    def __init__(self, compute, tiles):
+        self.compute = compute  # compute(period_slice, site_slice) -> dict of arrays
+        self.tiles = list(tiles)
+
+    def __iter__(self):
+        for ps, ss in self.tiles:
+            yield ps, ss, self.compute(ps, ss)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def for_site(self, site_index):
+        """Returns a TileStream restricted to the tiles that contain site_index."""
+        return TileStream(self.compute, [(ps, ss) for ps, ss in self.tiles if ss.start <= site_index < ss.stop])
 
 class MyDataProcessor:
     # MyDataProcessor 类用于读取文件、进行计算并绘制结果
+    #
+    # 当指定 storage_dir 时，大数组保存在 np.memmap 文件中，计算按周期分块流式写入。目录结构:
+    #   <storage_dir>/mtp-XXXXXXXX/<key>.npy  每个处理器 (包括 derive 得到的视图) 独占一个子目录 (storage_path)，
+    #   每个 DataFromDat 数组一个标准 .npy 文件 (C 顺序，首维为周期)，
+    #   key 即 DataFromDat 的键: Z_matrix, Zerr_matrix [nTx, nSites, 2, 2]，Phase_Tensor,
+    #   Apparent_resistivity, Phi (及 *_err) [nTx, nSites, 2, 2]，skew, Phi2, PT_* [nTx, nSites]。
+    #   同一处理器再次写入同一个键时 (重新读取文件或重新计算) 写入新文件 <key>.1.npy, <key>.2.npy ...，
+    #   已映射的文件从不被截断或覆盖。
+    # 这些文件可用 np.load(path, mmap_mode='r') 直接重新打开，子目录在处理器被回收时删除。
     
-    def __init__(self):
+    def __init__(self, storage_dir=None, chunk_size=16):
+        """
+        Parameters:
+        storage_dir (str): Optional directory for memory-mapped arrays, None keeps everything in memory.
+        chunk_size (int): Number of periods computed per chunk when storage_dir is set.
+        """
         self.data = None  # 存储读取的数据
         self.DataFromDat = None  # 存储计算后的数据
+        self.block_index = None  # 数据文件的块索引 (文件标识, 块列表)
+        self.storage_dir = storage_dir
+        self.chunk_size = chunk_size
+        self.storage_path = None  # 本处理器的映射文件目录，首次写入时在 storage_dir 下创建
+        self.locator = None  # 台站坐标的空间索引，见 site_locator
 
     def __repr__(self):
-        return f"<{self.__class__.__name__}>("f"DataFromDat: {self.DataFromDat.keys()})"
+        return f"<{self.__class__.__name__}>("f"DataFromDat: {list(self.DataFromDat)})"
+
+    @property
+    def nbytes(self):
+        """Size of the arrays in DataFromDat, used by the workflow profiler."""
+        return self.DataFromDat.nbytes if self.DataFromDat is not None else 0
+
+    def derive(self):
+        """
+        Returns a new processor viewing the same data. The large arrays are shared read-only,
+        results computed on the new processor are only visible there.
+        """
+        new = MyDataProcessor(storage_dir=self.storage_dir, chunk_size=self.chunk_size)
+        new.block_index = self.block_index
+        new.DataFromDat = self.DataFromDat.copy() if self.DataFromDat is not None else None
+        new.locator = self.locator  # 坐标数组是共享的，索引也可以共享
+        return new
+
+    def site_locator(self):
+        """
+        Returns the spatial index of the sites for nearest-site, radius and bounding box queries.
+        The index is built on first use and rebuilt only when the coordinates or site names change.
+        """
+        if self.DataFromDat is None:
+            raise ValueError("Data is not available.")
+        data = self.DataFromDat
+        if self.locator is None or self.locator.xyz is not data.xyz or self.locator.sitenames is not data.sitenames:
+            self.locator = SiteLocator(data.xyz, data.sitenames)
+        return self.locator
     ##################################################################################################################
     # read_file 以下方法用于读取文件
-    def __read_Zimp_3D(self, cfile, read_start=0):
+    def index_blocks(self, cfile):
         """
-        Reads the header and data from a Z3D data file and returns them in a formatted way.
+        Scans a ModEM data file once, in pieces of _READ_CHUNK bytes, and records every '>'-header block in it.
+        The index is cached at module level, so every processor (e.g. one per workflow run) reuses it while
+        the file's size and mtime are unchanged.
         
         Parameters:
-        cfile (str): File path to the Z3D data file.
+        cfile (str): File path to the ModEM data file.
         
         Returns:
-        header (list): List of header lines.
-        data_df (pandas.DataFrame): DataFrame containing the formatted data.
+        blocks (list): One dict per block with its header lines, block information,
+                       the line number of its first '>' line and the byte range of its data lines.
         """
-        if read_start < 0:
-            raise ValueError("read_start must be greater than or equal to 0.")
-        if not isinstance(read_start, int):
-            raise ValueError("read_start must be an integer.")
         if not os.path.exists(cfile):
             raise ValueError("File does not exist.")
-        header = []
-        data_lines = []
-        
-        # open the file and set the number of header lines
-        with open(cfile, 'r') as f:
-            nheader = 6;
-            header_alreadyread = 0;
-            blockinfo = []
-        # read the header lines
-            while header_alreadyread < nheader+read_start:
-                # Read the header info
-                line = f.readline().strip()
-                if line.startswith('>') and header_alreadyread + 1 >= read_start:
-                    header.append(line)
-                    blockinfo.append(line.strip('> '))
-                header_alreadyread += 1
-
-        # Extract the block information
-            dataType = blockinfo[0]
-            signstr = blockinfo[1]
-            typeUnits = blockinfo[2].strip()
-            orientation = blockinfo[3]
-            origin = blockinfo[4]
+        stat = os.stat(cfile)
+        key = (os.path.abspath(cfile), stat.st_size, stat.st_mtime_ns)
+        if self.block_index is not None and self.block_index[0] == key:
+            return self.block_index[1]
+        blocks = _BLOCK_INDEX.get(key)
+        if blocks is not None:
+            self.block_index = (key, blocks)
+            return blocks
+
+        # 分段扫描文件，只记录块头行、注释行和空行: (行号, 起始字节, 结束字节, 内容)
+        marks = []
+        line_no = 0
+        for offset, part in _line_chunks(cfile, 0, stat.st_size, _READ_CHUNK):
+            position = 0
+            for m in _MARK_LINE.finditer(part):
+                if m.start() == len(part):
+                    continue  # 段末换行符之后的空匹配不是一行
+                line_no += part.count(b'\n', position, m.start())
+                position = m.start()
+                marks.append((line_no, offset + m.start(), offset + m.end(), m.group()))
+            line_no += part.count(b'\n', position)
+        starts = [mark[1] for mark in marks]
+
+        # 将连续的 '>' 行归为同一个块头
+        groups = []
+        for mark in marks:
+            if not mark[3].lstrip().startswith(b'>'):
+                continue
+            if groups and mark[1] == groups[-1][-1][2] + 1:
+                groups[-1].append(mark)
+            else:
+                groups.append([mark])
+
+        blocks = []
+        nheader = 6
+        for group in groups:
+            if len(group) < nheader:
+                continue
+            group = group[:nheader]
+            header = [mark[3].decode().strip() for mark in group]
+            blockinfo = [line.strip('> ') for line in header]
+            data_start = min(group[-1][2] + 1, stat.st_size)
+            # 数据行在下一个记录的行处结束
+            end = bisect.bisect_left(starts, data_start)
+            data_end = starts[end] if end < len(starts) else stat.st_size
             nTx, nSites = map(int, blockinfo[5].split())
+            blocks.append({'header': header, 'dataType': blockinfo[0], 'signstr': blockinfo[1],
+                           'typeUnits': blockinfo[2].strip(), 'orientation': blockinfo[3],
+                           'origin': blockinfo[4], 'nTx': nTx, 'nSites': nSites,
+                           'line': group[0][0], 'data_start': data_start, 'data_end': data_end})
 
-        # Read the data lines
-            while True:
-                line = f.readline().strip()
-                if line.startswith('>') or not line:
-                    break
-                data_lines.append(line)
+        self.block_index = (key, blocks)
+        with _BLOCK_INDEX_LOCK:
+            # 文件修改后旧的索引不再有效
+            for old in [k for k in _BLOCK_INDEX if k[0] == key[0]]:
+                del _BLOCK_INDEX[old]
+            _BLOCK_INDEX[key] = blocks
+        return blocks
+
+    def __read_Zimp_3D(self, cfile, read_start=0, dataType='Full_Impedance', cancel_check=None):
+        """
+        Reads the header and data of one impedance block from a Z3D data file and returns them in a formatted way.
+        The block is located through index_blocks, only its data lines are read from disk.
+        With storage_dir or cancel_check the data lines are read and parsed in pieces of about _READ_CHUNK bytes
+        that are scattered straight into Z_matrix/Zerr_matrix (memory-mapped when storage_dir is set), so neither
+        the block nor a DataFrame of the whole block is held in memory.
         
-        # Convert the data to a pandas DataFrame
-        data_columns = ['period', 'site_code', 'lat', 'lon', 'x', 'y', 'z', 'comp', 'real', 'imag', 'err','Amuth']
-        data_df = pd.DataFrame([line.split() for line in data_lines], columns=data_columns)
+        Parameters:
+        cfile (str): File path to the Z3D data file.
+        read_start (int): Line number from which to look for the block, 0 means the whole file.
+        dataType (str): ModEM block type to read, e.g. 'Full_Impedance' or 'Off_Diagonal_Impedance'.
+        cancel_check (callable): Optional, called before each piece and expected to raise to stop reading.
         
-        return header, data_df, dataType, signstr, typeUnits, orientation, origin, nTx, nSites
+        Returns:
+        block (dict): The block's entry from index_blocks (header lines and block information).
+        T (numpy.ndarray): Periods, shape [nTx].
+        Sitenames (list): Site codes, shape [nSites].
+        XYZ (numpy.ndarray): Site coordinates, shape [nSites, 3].
+        Z_matrix (numpy.ndarray): Complex impedances, shape [nTx, nSites, 2, 2].
+        Zerr_matrix (numpy.ndarray): Impedance errors, shape [nTx, nSites, 2, 2].
+        """
+        if read_start < 0:
+            raise ValueError("read_start must be greater than or equal to 0.")
+        if not isinstance(read_start, int):
+            raise ValueError("read_start must be an integer.")
+        blocks = self.index_blocks(cfile)
+        block = next((b for b in blocks if b['dataType'] == dataType and b['line'] >= read_start), None)
+        if block is None:
+            found = [b['dataType'] for b in blocks]
+            raise ValueError(f"No {dataType} block found after line {read_start}, blocks in file: {found}")
+
+        shape = (block['nTx'], block['nSites'], 2, 2)
+        if self.storage_dir is None:
+            Z_matrix, Zerr_matrix = np.zeros(shape, dtype=complex), np.zeros(shape)
+        else:
+            # 新建的映射文件内容为 0
+            Z_matrix = self._allocate('Z_matrix', shape, np.complex128)
+            Zerr_matrix = self._allocate('Zerr_matrix', shape, np.float64)
+        assembler = _ImpedanceAssembler(Z_matrix, Zerr_matrix)
+
+        # Convert the data with typed columns, in one bulk pass when everything is kept in memory anyway
+        parse = partial(pd.read_csv, sep=r'\s+', header=None, names=_DATA_COLUMNS, dtype=_DATA_DTYPES,
+                        float_precision='round_trip')
+        chunk = _READ_CHUNK if self.storage_dir is not None or cancel_check is not None else block['data_end']
+        for _, data_bytes in _line_chunks(cfile, block['data_start'], block['data_end'], max(chunk, 1)):
+            if cancel_check is not None:
+                cancel_check()
+            assembler.add(parse(io.BytesIO(data_bytes)))
+        if not assembler.periods:
+            raise ValueError(f"The {dataType} block contains no data.")
+        if self.storage_dir is not None:
+            Z_matrix.flush()
+            Zerr_matrix.flush()
+        return (block, *assembler.result(), Z_matrix, Zerr_matrix)
     
     ##################################################################################################################
     # 以下方法用于数据转化和存储
-    def read_file(self, file_path, file_type='Z_ALL_3D', read_start=0):
-        if file_type == 'Z_ALL_3D':
-            header, data_df, dataType, signstr, typeUnits, orientation, origin, nTx, nSites = self.__read_Zimp_3D(file_path, read_start)
-            # get T, Sitenames and XYZ from data_df
-            T_val = data_df['period'].values
-            # remove duplicate values
-            T = list(dict.fromkeys(T_val))
-
-            Sitenames_val = data_df['site_code'].values
-            # remove duplicate values
-            Sitenames = list(dict.fromkeys(Sitenames_val))
-
-            XYZ = data_df[['x', 'y', 'z']].values
-            # remove duplicate values
-            XYZ = list(dict.fromkeys(tuple(x) for x in XYZ))
-            
-
-            # get Z-matrix and Z-error-matrix from data_df,format: [nTx, nSites, nComp, 2]
-            Z_val = data_df[['real', 'imag']].values
-            Zerr = data_df['err'].values
-            Comp_val = data_df['comp'].values
-
-            Z_matrix = np.zeros([nTx, nSites, 2, 2], dtype=complex)
-            Zerr_matrix = np.zeros([nTx, nSites, 2, 2])
-            for i in range(len(Z_val)):
-                Tn = T.index(T_val[i])
-                Sn = Sitenames.index(Sitenames_val[i])
-                Cn = ['ZXX', 'ZXY', 'ZYX', 'ZYY'].index(Comp_val[i])
-                row , col = divmod(Cn, 2)
-                Z_matrix[Tn, Sn, row, col] = float(Z_val[i][0]) + 1j * float(Z_val[i][1])
-                Zerr_matrix[Tn, Sn, row, col] = Zerr[i]
-            
-            self.DataFromDat = {'header': header, 'T': T, 'Sitenames': Sitenames, 'XYZ': XYZ, 'Z_matrix': Z_matrix, 'Zerr_matrix': Zerr_matrix, 'dataType': dataType, 'signstr': signstr, 'typeUnits': typeUnits, 'orientation': orientation, 'origin': origin, 'nTx': nTx, 'nSites': nSites}
-
-    def get_distance(self):
+    def read_file(self, file_path, file_type='Z_ALL_3D', read_start=0, cache=None, cancel_check=None):
+        """
+        Reads one data block of file_path into DataFromDat.
+        
+        Parameters:
+        cache (DatasetCache): Optional parsed-file cache, a hit skips parsing and a miss stores the parsed result.
+        cancel_check (callable): Optional, called while parsing and expected to raise to stop reading.
+
+        With storage_dir set, Z_matrix and Zerr_matrix are written to memory-mapped files while the file (or the
+        cache entry) is read piece by piece, so memory use stays around _READ_CHUNK regardless of the survey size.
+        """
+        if file_type not in _FILE_TYPES:
+            raise ValueError(f"Unsupported file type: {file_type}")
+        # 使用映射文件时，缓存中的阻抗直接分段复制到映射文件中
+        allocate = self._allocate if self.storage_dir is not None else None
+        dataset = cache.load(file_path, file_type, read_start, allocate=allocate) if cache is not None else None
+        if dataset is not None:
+            self.DataFromDat = dataset
+        elif file_type in ('Z_ALL_3D', 'Z_offdiag_3D'):
+            block, T, Sitenames, XYZ, Z_matrix, Zerr_matrix = self.__read_Zimp_3D(file_path, read_start, _FILE_TYPES[file_type], cancel_check)
+            self.DataFromDat = MTDataset(T, Sitenames, XYZ, Z_matrix, Zerr_matrix, header=block['header'],
+                                         dataType=block['dataType'], signstr=block['signstr'],
+                                         typeUnits=block['typeUnits'], orientation=block['orientation'],
+                                         origin=block['origin'])
+            if cache is not None:
+                # 缓存写入失败 (磁盘已满、权限等) 不影响读取结果
+                try:
+                    cache.save(file_path, file_type, read_start, self.DataFromDat)
+                except OSError as e:
+                    print(f"缓存写入失败: {e}")
+
+    def get_distance(self, profile='endpoints', azimuth=None, vertices=None):
+        """
+        Projects the sites onto a profile and stores the results as distancebyDat (distance along the profile),
+        offsetbyDat (perpendicular offset) and profileOrder (site indices sorted along the profile), all in metres.
+
+        Parameters:
+        profile (str): 'endpoints' (line from the first to the last site), 'fit' (least-squares line),
+                       'azimuth' (line through the first site with the given azimuth) or 'polyline'.
+        azimuth (float): Azimuth in degrees from north (ModEM x) towards east, for profile='azimuth'.
+        vertices (array-like): Polyline vertices in ModEM x, y metres, shape [n, 2], for profile='polyline'.
+
+        Returns:
+        distance, offset, order (numpy.ndarray): See project_profile.
+        """
         if self.DataFromDat is None:
             raise ValueError("Data is not available.")
-        XYZ = self.DataFromDat.get('XYZ')
-        XY = np.array(XYZ)[:, :2]
-        XY = [list(map(float, sublist)) for sublist in XY]
-        origin = copy.deepcopy(XY[0])
-        end_site = copy.deepcopy(XY[-1])
-        angle = np.arctan2(end_site[1] - origin[1], end_site[0] - origin[0])
-        distance = []
-        rotation_matrix = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
-        for sublist in XY:
-            sublist[0] = sublist[0] - origin[0]
-            sublist[1] = sublist[1] - origin[1]
-            sublist = np.dot(rotation_matrix.T, np.array(sublist).T).T
-            distance.append(sublist[0])
-        self.DataFromDat.update({'distancebyDat': distance})
-        # rotate the coordinate
+        distance, offset, order = project_profile(self.DataFromDat.xyz[:, :2], profile, azimuth, vertices)
+        self.DataFromDat.update({'distancebyDat': distance, 'offsetbyDat': offset, 'profileOrder': order})
+        return distance, offset, order
     ##################################################################################################################
     # 进行计算的方法
-    def compute_phase_Tensor(self):
+    def _storage_file(self, key):
+        """Returns a new file name for key in this processor's own directory, existing files are never reused."""
+        if self.storage_path is None:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            self.storage_path = tempfile.mkdtemp(prefix='mtp-', dir=self.storage_dir)
+            # 处理器被回收时删除目录，仍在使用的映射在 POSIX 系统上不受影响
+            weakref.finalize(self, shutil.rmtree, self.storage_path, True)
+        path, n = os.path.join(self.storage_path, key + '.npy'), 0
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(self.storage_path, f"{key}.{n}.npy")
+        return path
+
+    def _allocate(self, key, shape, dtype):
+        """Allocates an output array, memory-mapped to a new .npy file of this processor when storage_dir is set."""
+        if self.storage_dir is None:
+            return np.empty(shape, dtype=dtype)
+        return np.lib.format.open_memmap(self._storage_file(key), mode='w+', dtype=dtype, shape=shape)
+
+    def iter_tiles(self, period_tile=None, site_tile=None):
+        """
+        Yields (period_slice, site_slice) pairs covering the survey in fixed-size tiles.
+        
+        Parameters:
+        period_tile (int): Periods per tile, None for all periods.
+        site_tile (int): Sites per tile, None for all sites.
+        """
+        if self.DataFromDat is None:
+            raise ValueError("Data is not available.")
+        nTx, nSites = self.DataFromDat.nTx, self.DataFromDat.nSites
+        period_tile = period_tile or nTx
+        site_tile = site_tile or nSites
+        for p0 in range(0, nTx, period_tile):
+            for s0 in range(0, nSites, site_tile):
+                yield slice(p0, min(p0 + period_tile, nTx)), slice(s0, min(s0 + site_tile, nSites))
+
+    def stream_phase_Tensor(self, period_tile=None, site_tile=None):
+        """Returns a TileStream of phase_tensor results, computed lazily tile by tile."""
+        return TileStream(partial(_phase_tensor_tile, self.DataFromDat.Z), self.iter_tiles(period_tile, site_tile))
+
+    def stream_apparent_resistivity(self, period_tile=None, site_tile=None, dtype=np.float64):
+        """Returns a TileStream of apparent_resistivity results, computed lazily tile by tile."""
+        compute = partial(_apparent_resistivity_tile, self.DataFromDat.Z, self.DataFromDat.periods,
+                          self.DataFromDat.Zerr, dtype)
+        return TileStream(compute, self.iter_tiles(period_tile, site_tile))
+
+    def _collect(self, stream, cancel_check=None):
+        """
+        Writes every tile of stream straight into full-size output arrays (memory-mapped when storage_dir is set).
+        Without storage_dir, a stream made of a single tile is returned as is, without copying.
+
+        Parameters:
+        cancel_check (callable): Optional, called before computing every tile and expected to raise to stop
+                                 the computation.
+        
+        Returns:
+        outputs (dict): Output arrays covering all periods and sites.
+        """
+        nTx, nSites = self.DataFromDat.nTx, self.DataFromDat.nSites
+        outputs = {}
+        for ps, ss in stream.tiles:
+            if cancel_check is not None:
+                cancel_check()
+            result = stream.compute(ps, ss)
+            if not outputs and len(stream) == 1 and self.storage_dir is None:
+                return result
+            for key, value in result.items():
+                if key not in outputs:
+                    outputs[key] = self._allocate(key, (nTx, nSites) + value.shape[2:], value.dtype)
+                outputs[key][ps, ss] = value
+        if self.storage_dir is not None:
+            for value in outputs.values():
+                value.flush()
+        return outputs
+
+    def _period_tile(self, cancel_check=None):
+        """Periods per tile: chunk_size with memory-mapped storage or a cancel check, otherwise all periods at once."""
+        return self.chunk_size if self.storage_dir is not None or cancel_check is not None else None
+
+    def compute_phase_Tensor(self, cancel_check=None):
         if self.DataFromDat is None:
             raise ValueError("Data is not available.")
-        Phase_Tensor = np.zeros([self.DataFromDat.get('nTx'), self.DataFromDat.get('nSites'), 2, 2])
-        skew = np.zeros([self.DataFromDat.get('nTx'), self.DataFromDat.get('nSites')])
-        Phi2 = np.zeros([self.DataFromDat.get('nTx'), self.DataFromDat.get('nSites')])
-        for i in range(self.DataFromDat.get('nTx')):
-            for j in range(self.DataFromDat.get('nSites')):
-                Z_tensor = self.DataFromDat.get('Z_matrix')[i, j]
-                # Phase_Tensor = inv(real(Z_tensor))*imag(Z_tensor)
-                Phase_Tensor[i, j] = np.linalg.inv(np.real(Z_tensor)).dot(np.imag(Z_tensor))
-
-                Pxx = Phase_Tensor[i, j, 0, 0]
-                Pxy = Phase_Tensor[i, j, 0, 1]
-                Pyx = Phase_Tensor[i, j, 1, 0]
-                Pyy = Phase_Tensor[i, j, 1, 1]
-                phi = np.array([[Pxx, Pxy], [Pyx, Pyy]])
-                rot_angle = 1/4 * np.arctan2(2 * (Pxx - Pyy) * (Pxy + Pyx),(Pxx - Pyy)**2 - (Pxy + Pyx)**2)
-                rot_M = np.array([[np.cos(rot_angle), -np.sin(rot_angle)], [np.sin(rot_angle), np.cos(rot_angle)]])
-                phi = np.dot(np.dot(rot_M, phi), rot_M.T)
-
-                phi2_ij = np.degrees(np.arctan(np.sqrt(np.abs(phi[0, 0] * phi[1, 1] - phi[0, 1] * phi[1, 0]))))
-                skew_ij = np.degrees(1/2 * np.arctan(np.abs((phi[0, 1] - phi[1, 0]) / (phi[0, 0] + phi[1, 1]))))
-                skew[i, j] = skew_ij
-                Phi2[i, j] = phi2_ij
-        self.DataFromDat.update({'skew': skew})
-        self.DataFromDat.update({'Phi2': Phi2})
-        self.DataFromDat.update({'Phase_Tensor': Phase_Tensor})
+        # 对 [nTx, nSites, 2, 2] 张量批量计算，使用映射文件或可取消时按周期分块
+        period_tile = self._period_tile(cancel_check)
+        self.DataFromDat.update(self._collect(self.stream_phase_Tensor(period_tile), cancel_check))
     
 
-    def compute_apparent_resistivity(self):
+    def compute_apparent_resistivity(self, dtype=np.float64, cancel_check=None):
+        """
+        Computes apparent resistivity, phase and their error bars for all periods and sites.
+        
+        Parameters:
+        dtype: Output dtype of Apparent_resistivity/Phi and their errors, np.float32 halves their memory.
+        cancel_check (callable): Optional, called before every chunk of periods and expected to raise to stop the computation.
+        """
         if self.DataFromDat is None:
             raise ValueError("Data is not available.")
-        Apparent_resistivity = np.zeros([self.DataFromDat.get('nTx'), self.DataFromDat.get('nSites'),2,2])
-        Phi = np.zeros([self.DataFromDat.get('nTx'), self.DataFromDat.get('nSites'),2,2])
-        for i in range(self.DataFromDat.get('nTx')):
-            for j in range(self.DataFromDat.get('nSites')):
-                period = self.DataFromDat.get('T')[i]
-                period = float(period)
-                
-                Z_tensor = self.DataFromDat.get('Z_matrix')[i, j]
-                Rhoxx = 0.2 * period * np.abs(Z_tensor[0, 0])**2
-                Rhoxy = 0.2 * period * np.abs(Z_tensor[0, 1])**2
-                Rhoyx = 0.2 * period * np.abs(Z_tensor[1, 0])**2
-                Rhoyy = 0.2 * period * np.abs(Z_tensor[1, 1])**2
-                Phixx = np.angle(Z_tensor[0, 0])
-                Phixy = np.angle(Z_tensor[0, 1])
-                Phiyx = np.angle(Z_tensor[1, 0])
-                Phiyy = np.angle(Z_tensor[1, 1])
-                Apparent_resistivity[i, j] = np.array([[Rhoxx, Rhoxy], [Rhoyx, Rhoyy]])
-                Phi[i, j] = np.array([[Phixx, Phixy], [Phiyx, Phiyy]])
-        self.DataFromDat.update({'Apparent_resistivity': Apparent_resistivity})
-        self.DataFromDat.update({'Phi': Phi})
+        period_tile = self._period_tile(cancel_check)
+        self.DataFromDat.update(self._collect(self.stream_apparent_resistivity(period_tile, dtype=dtype), cancel_check))
     ##################################################################################################################
     # 检验绘制结果的简易方法
     def plot_para_xdistance_yperiod_colorpara(self, parameter='skew'):
         if self.DataFromDat.get(parameter) is None:
             raise ValueError("Parameter is not available.")
+        # matplotlib 仅在此调试方法中使用，延迟导入以加快无界面运行时的启动
+        import matplotlib.pyplot as plt
         para= self.DataFromDat.get(parameter)
         fig, ax = plt.subplots()
         cax = ax.matshow(para, cmap='jet')
         fig.colorbar(cax)
         plt.show()
 
-    def plot_resistivity_of_one_site(self, site_index):
+    def site_curves(self, site_index):
+        """
+        Returns the apparent resistivity curves of one site.
+
+        Returns:
+        curves (dict): 'Apparent_resistivity', 'Phi', 'Apparent_resistivity_err' and 'Phi_err', each [nTx, 2, 2].
+                       Taken from DataFromDat, the phase and errors are computed from Z_matrix/Zerr_matrix of
+                       this site when compute_apparent_resistivity has not stored them.
+        """
         if self.DataFromDat.get('Apparent_resistivity') is None:
             raise ValueError("Apparent_resistivity is not available.")
-        Apparent_resistivity = self.DataFromDat.get('Apparent_resistivity')
-        T = np.array(self.DataFromDat.get('T')).astype(float)
-        min_T = min(T)
-        max_T = max(T)
-        
-        fig = go.Figure()
-
-        # 添加第一个数据点并显示图例标签
-        fig.add_trace(go.Scattergl(
-            x=[T[0]], y=[Apparent_resistivity[0, site_index, 0, 0]],
-            mode='markers', name='Rhoxx', marker=dict(color='green')
-        ))
-        fig.add_trace(go.Scattergl(
-            x=[T[0]], y=[Apparent_resistivity[0, site_index, 0, 1]],
-            mode='markers', name='Rhoxy', marker=dict(color='red')
-        ))
-        fig.add_trace(go.Scattergl(
-            x=[T[0]], y=[Apparent_resistivity[0, site_index, 1, 0]],
-            mode='markers', name='Rhoyx', marker=dict(color='blue')
-        ))
-        fig.add_trace(go.Scattergl(
-            x=[T[0]], y=[Apparent_resistivity[0, site_index, 1, 1]],
-            mode='markers', name='Rhoyy', marker=dict(color='yellow')
-        ))
-
-        # 添加后续数据点并隐藏图例标签
-        for i in range(1, Apparent_resistivity.shape[0]):
-            fig.add_trace(go.Scattergl(
-                x=[T[i]], y=[Apparent_resistivity[i, site_index, 0, 0]],
-                mode='markers', marker=dict(color='green'), showlegend=False
-            ))
-            fig.add_trace(go.Scattergl(
-                x=[T[i]], y=[Apparent_resistivity[i, site_index, 0, 1]],
-                mode='markers', marker=dict(color='red'), showlegend=False
-            ))
-            fig.add_trace(go.Scattergl(
-                x=[T[i]], y=[Apparent_resistivity[i, site_index, 1, 0]],
-                mode='markers', marker=dict(color='blue'), showlegend=False
-            ))
-            fig.add_trace(go.Scattergl(
-                x=[T[i]], y=[Apparent_resistivity[i, site_index, 1, 1]],
-                mode='markers', marker=dict(color='yellow'), showlegend=False
-            ))
-
-        fig.update_layout(
-            xaxis=dict(
-                type='log',
-                range=[np.log10(0.001), np.log10(10000)],
-                title='Period (s)',
-                tickvals=[0.001, 0.01, 0.1, 1, 10, 100, 1000, 10000],
-                ticktext=['0.001', '0.01', '0.1', '1', '10', '100', '1000', '10000']
-            ),
-            yaxis=dict(
-                type='log',
-                range=[np.log10(0.1), np.log10(10000)],
-                title='Apparent Resistivity (Ohm.m)',
-                tickvals=[0.1, 1, 10, 100, 1000, 10000],
-                ticktext=['0.1', '1', '10', '100', '1000', '10000']
-            ),
+        curves = {key: self.DataFromDat[key][:, site_index] for key in _CURVE_KEYS if key in self.DataFromDat}
+        if len(curves) < len(_CURVE_KEYS):
+            # 只计算这一个台站，开销可以忽略
+            site = apparent_resistivity(self.DataFromDat.Z[:, site_index], self.DataFromDat.periods,
+                                        self.DataFromDat.Zerr[:, site_index])
+            curves = {**site, **curves}
+        return curves
+
+    def plot_resistivity_of_one_site(self, site_index, curves=None, show_phase=False, error_bars=True):
+        """
+        Plots the apparent resistivity (and optionally the phase) of one site, one trace per component.
+
+        Parameters:
+        site_index (int): Index of the site to plot.
+        curves (dict): Optional per-site arrays [nTx, 2, 2] as returned by site_curves, e.g. gathered from
+                       stream_apparent_resistivity tiles, instead of DataFromDat. Only 'Apparent_resistivity'
+                       is required.
+        show_phase (bool): Adds a phase subplot below the resistivity.
+        error_bars (bool): Draws error bars when errors are available.
+        """
+        if curves is None:
+            curves = self.site_curves(site_index)
+        T = np.asarray(self.DataFromDat.periods)
+        rho = curves['Apparent_resistivity']
+        rho_err = curves.get('Apparent_resistivity_err') if error_bars else None
+        phase = np.degrees(curves['Phi']) if show_phase and 'Phi' in curves else None
+        phase_err = curves.get('Phi_err') if error_bars and phase is not None else None
+
+        # 每个分量一条曲线，包含所有周期；直接构造字典并一次性创建 Figure，避免逐条校验的开销
+        traces = []
+        for (r, c), (name, color) in _CURVE_STYLES.items():
+            traces.append(dict(type='scatter', x=T, y=rho[:, r, c], mode='markers', name='Rho' + name,
+                               legendgroup=name, marker=dict(color=color),
+                               error_y=None if rho_err is None else dict(type='data', array=rho_err[:, r, c])))
+            if phase is not None:
+                traces.append(dict(type='scatter', x=T, y=phase[:, r, c], mode='markers', name='Phi' + name,
+                                   legendgroup=name, marker=dict(color=color), showlegend=False,
+                                   xaxis='x2', yaxis='y2',
+                                   error_y=None if phase_err is None else dict(type='data',
+                                                                               array=np.degrees(phase_err[:, r, c]))))
+
+        # 坐标范围由数据决定，对数轴两端各留 0.1 个数量级
+        period_axis = dict(type='log', range=_log_range(T), title=dict(text='Period (s)'))
+        layout = dict(
+            xaxis=period_axis,
+            yaxis=dict(type='log', range=_log_range(rho), title=dict(text='Apparent Resistivity (Ohm.m)')),
             # 台站名称
-            title=self.DataFromDat.get('Sitenames')[site_index],
+            title=dict(text=self.DataFromDat.get('Sitenames')[site_index]),
             showlegend=True
         )
+        if phase is not None:
+            # 相位子图位于下方，与视电阻率共用周期轴
+            layout['xaxis'] = dict(type='log', range=period_axis['range'], matches='x2', showticklabels=False)
+            layout['yaxis']['domain'] = [0.34, 1]
+            layout['xaxis2'] = dict(period_axis, anchor='y2')
+            layout['yaxis2'] = dict(range=_linear_range(phase), title=dict(text='Phase (deg)'), domain=[0, 0.28],
+                                    anchor='x2')
+        self.fig = go.Figure(data=traces, layout=layout)
+
+    def pseudo_section(self, parameter='skew', component='xy'):
+        """
+        Arranges a parameter as a profile distance x period section.
+
+        Parameters:
+        parameter (str): One of SECTION_PARAMETERS, it must have been computed.
+        component (str): 'xx', 'xy', 'yx' or 'yy' for the [nTx, nSites, 2, 2] parameters, ignored otherwise.
+
+        Returns:
+        distance (numpy.ndarray): Site offsets along the profile in ascending order, shape [nSites].
+        periods (numpy.ndarray): Periods in ascending order, shape [nTx].
+        values (numpy.ndarray): float32 section [nTx, nSites] in the same order, the resistivity as log10 and
+                                the phase in degrees.
+        label (str): Colour bar title.
+        """
+        if parameter not in SECTION_PARAMETERS:
+            raise ValueError(f"Unsupported parameter: {parameter}")
+        if self.DataFromDat.get(parameter) is None:
+            raise ValueError(f"{parameter} is not available.")
+        if self.DataFromDat.get('distancebyDat') is None:
+            self.get_distance()
+        values = np.asarray(self.DataFromDat[parameter])
+        if values.ndim == 4:
+            components = {name: rc for rc, (name, _) in _CURVE_STYLES.items()}
+            if component not in components:
+                raise ValueError(f"Unsupported component: {component}")
+            values = values[(...,) + components[component]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if parameter == 'Apparent_resistivity':
+                values = np.log10(values)
+            elif parameter == 'Phi':
+                values = np.degrees(values)
+        distance = np.asarray(self.DataFromDat['distancebyDat'], dtype=float)
+        site_order = np.argsort(distance, kind='stable')
+        period_order = np.argsort(self.DataFromDat.periods, kind='stable')
+        values = values[np.ix_(period_order, site_order)].astype(np.float32)
+        return distance[site_order], self.DataFromDat.periods[period_order], values, SECTION_PARAMETERS[parameter]
+
+    def plot_pseudo_section(self, parameter='skew', component='xy', colorscale='Jet'):
+        """
+        Plots a pseudo-section of distance (km) against log period as a single Heatmap trace, periods increase
+        downwards. The figure is stored in self.fig.
+        """
+        distance, T, values, label = self.pseudo_section(parameter, component)
+        logT = np.log10(T)
+        decades = np.arange(np.floor(logT.min()), np.ceil(logT.max()) + 1)
+        title = f"{parameter} {component}" if np.ndim(self.DataFromDat[parameter]) == 4 else parameter
+        trace = dict(type='heatmap', x=distance / 1000, y=logT, z=values, colorscale=colorscale,
+                     colorbar=dict(title=dict(text=label)),
+                     hovertemplate='%{x:.2f} km<br>log10 T = %{y:.2f}<br>%{z:.3g}<extra></extra>')
+        layout = dict(
+            title=dict(text=title),
+            xaxis=dict(title=dict(text='Distance (km)')),
+            # 纵轴为 log10(周期)，刻度标注为周期
+            yaxis=dict(title=dict(text='Period (s)'), autorange='reversed', tickvals=decades,
+                       ticktext=[f"{10.0**d:g}" for d in decades])
+        )
+        self.fig = go.Figure(data=[trace], layout=layout)
+
+    def plot_phase_tensor_ellipses(self, period_index=0, mode='map', color='PT_phimin', n_points=32, scale=1.0,
+                                   max_ellipses=MAX_ELLIPSES):
+        """
+        Draws phase tensor ellipses as one outline trace (outlines separated by NaN gaps) plus one marker trace
+        at the ellipse centres coloured by `color`. The major axis is Phi max, the minor axis Phi min, both
+        normalized to the largest Phi max, and the major axis points along alpha - beta.
+
+        Parameters:
+        period_index (int): Period drawn in 'map' mode.
+        mode (str): 'map' draws every site at its coordinates (east, north in km) for one period,
+                    'section' draws all periods (see max_ellipses) against profile distance and log10 period.
+        color (str): One of ELLIPSE_COLORS.
+        n_points (int): Points per ellipse outline.
+        scale (float): Size of the largest ellipse relative to the site (and period) spacing.
+        max_ellipses (int): Upper limit of the ellipses drawn in 'section' mode, sites (and periods when there are
+                            more periods than max_ellipses) are then subsampled evenly.
+        """
+        data = self.DataFromDat
+        if any(data.get(key) is None for key in ('PT_phimin', 'PT_phimax', 'PT_alpha', 'PT_beta')):
+            raise ValueError("Phase tensor is not available.")
+        if color not in ELLIPSE_COLORS or data.get(color) is None:
+            raise ValueError(f"Unsupported or unavailable color parameter: {color}")
+        if mode == 'map':
+            if not 0 <= period_index < data.nTx:
+                raise ValueError(f"Period index {period_index} is out of range [0, {data.nTx}).")
+            periods, sites = np.array([period_index]), np.arange(data.nSites)
+            # 横轴为东向 (ModEM 的 y)，纵轴为北向 (ModEM 的 x)，单位 km
+            centre_x = np.broadcast_to(data.xyz[:, 1] / 1000, (1, data.nSites))
+            centre_y = np.broadcast_to(data.xyz[:, 0] / 1000, (1, data.nSites))
+            # 以相邻台站间距的中位数作为椭圆大小的参考
+            steps = np.hypot(*np.diff(data.xyz[:, :2], axis=0).T) / 1000 if data.nSites > 1 else np.array([1.0])
+            spacing_x = spacing_y = np.median(steps[steps > 0]) if (steps > 0).any() else 1.0
+            title = f"Phase tensor ellipses, T = {data.periods[period_index]:g} s"
+        elif mode == 'section':
+            if data.get('distancebyDat') is None:
+                self.get_distance()
+            distance = np.asarray(data['distancebyDat'], dtype=float) / 1000
+            sites = np.argsort(distance, kind='stable')
+            periods = np.argsort(data.periods, kind='stable')
+            # 椭圆总数不超过 max_ellipses: 优先保留所有周期，按台站均匀抽稀，周期过多时周期也均匀抽稀
+            n_periods = max(1, min(data.nTx, max_ellipses))
+            n_sites = max(1, min(data.nSites, max_ellipses // n_periods))
+            periods = periods[np.unique(np.linspace(0, data.nTx - 1, n_periods).round().astype(int))]
+            sites = sites[np.unique(np.linspace(0, data.nSites - 1, n_sites).round().astype(int))]
+            logT = np.log10(data.periods[periods])
+            centre_x = np.broadcast_to(distance[sites], (len(periods), len(sites)))
+            centre_y = np.broadcast_to(logT[:, None], (len(periods), len(sites)))
+            spacing_x = np.ptp(distance) / max(len(sites) - 1, 1) or 1.0
+            # 周期轴向下增大，取负号使北向仍朝上
+            spacing_y = -(np.ptp(logT) / max(len(periods) - 1, 1) or 1.0)
+            title = "Phase tensor ellipses"
+        else:
+            raise ValueError(f"Unsupported mode: {mode}")
 
-        self.fig = fig
+        index = np.ix_(periods, sites)
+        phimax = data['PT_phimax'][index].ravel()
+        phimin = data['PT_phimin'][index].ravel()
+        strike = np.radians(data['PT_alpha'][index] - data['PT_beta'][index]).ravel()
+        with np.errstate(invalid='ignore'):
+            norm = np.nanmax(np.abs(phimax)) if np.isfinite(phimax).any() else 1.0
+        radius = 0.5 * scale / (norm or 1.0)
+        x, y = ellipse_outlines(centre_x.ravel(), centre_y.ravel(), phimax * radius, phimin * radius, strike,
+                                n_points, spacing_x, spacing_y)
+        # 点数较多时使用 WebGL
+        trace_type = 'scattergl' if x.size > 100000 else 'scatter'
+        traces = [dict(type=trace_type, x=x, y=y, mode='lines', line=dict(color='black', width=1),
+                       hoverinfo='skip', showlegend=False),
+                  dict(type=trace_type, x=centre_x.ravel(), y=centre_y.ravel(), mode='markers',
+                       marker=dict(size=5, color=data[color][index].ravel(), colorscale='Jet', showscale=True,
+                                   colorbar=dict(title=dict(text=ELLIPSE_COLORS[color]))),
+                       text=np.repeat([[data.sitenames[i] for i in sites]], len(periods), axis=0).ravel(),
+                       hovertemplate='%{text}<br>%{marker.color:.3g}<extra></extra>', showlegend=False)]
+        if mode == 'map':
+            layout = dict(title=dict(text=title), xaxis=dict(title=dict(text='East (km)')),
+                          yaxis=dict(title=dict(text='North (km)'), scaleanchor='x', scaleratio=1))
+        else:
+            decades = np.arange(np.floor(logT.min()), np.ceil(logT.max()) + 1)
+            layout = dict(title=dict(text=title), xaxis=dict(title=dict(text='Distance (km)')),
+                          yaxis=dict(title=dict(text='Period (s)'), autorange='reversed', tickvals=decades,
+                                     ticktext=[f"{10.0**d:g}" for d in decades]))
+        self.fig = go.Figure(data=traces, layout=layout)
 
 if __name__ == '__main__':
     processor = MyDataProcessor()
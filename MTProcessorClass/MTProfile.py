@@ -0,0 +1,103 @@
+import numpy as np
+
+# 支持的测线定义
+PROFILE_TYPES = ('endpoints', 'fit', 'azimuth', 'polyline')
+
+
+def profile_direction(xy, profile='endpoints', azimuth=None):
+    """
+    Direction of a straight profile as an azimuth, measured from x (north) towards y (east) like ModEM
+    coordinates.
+
+    Parameters:
+    xy (numpy.ndarray): Site coordinates, shape [nSites, 2].
+    profile (str): 'endpoints' for the line from the first to the last site, 'fit' for the least-squares
+                   line through all sites, 'azimuth' for a given direction.
+    azimuth (float): Profile azimuth in degrees, required for profile='azimuth'.
+
+    Returns:
+    angle (float): Azimuth in radians.
+    """
+    if profile == 'endpoints':
+        return np.arctan2(xy[-1, 1] - xy[0, 1], xy[-1, 0] - xy[0, 0])
+    if profile == 'fit':
+        # 总体最小二乘: 去中心化坐标的第一主方向
+        _, _, vt = np.linalg.svd(xy - xy.mean(axis=0), full_matrices=False)
+        direction = vt[0]
+        # 方向与第一个台站指向最后一个台站的方向保持一致
+        if np.dot(direction, xy[-1] - xy[0]) < 0:
+            direction = -direction
+        return np.arctan2(direction[1], direction[0])
+    if profile == 'azimuth':
+        if azimuth is None:
+            raise ValueError("An azimuth is required for profile='azimuth'.")
+        return np.radians(azimuth)
+    raise ValueError(f"Unsupported profile: {profile}")
+
+
+def project_polyline(xy, vertices):
+    """
+    Projects sites onto the nearest segment of a polyline.
+
+    Parameters:
+    xy (numpy.ndarray): Site coordinates, shape [nSites, 2].
+    vertices (array-like): Polyline vertices in the same coordinates, shape [nVertices, 2], nVertices >= 2.
+
+    Returns:
+    distance (numpy.ndarray): Length along the polyline from its first vertex, shape [nSites].
+    offset (numpy.ndarray): Signed distance from the polyline, positive to the right of it.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+    if len(vertices) < 2:
+        raise ValueError("A polyline profile needs at least two vertices.")
+    start = vertices[:-1]
+    segment = np.diff(vertices, axis=0)
+    length = np.hypot(segment[:, 0], segment[:, 1])
+    chainage = np.concatenate([[0.0], np.cumsum(length)[:-1]])
+    # 所有台站与所有线段同时计算，形状 [nSites, nSegments]
+    relative = xy[:, None, :] - start[None, :, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.einsum('nsk,sk->ns', relative, segment) / length**2, 0.0, 1.0)
+    t = np.nan_to_num(t)  # 长度为零的线段
+    gap = relative - t[..., None] * segment[None, :, :]
+    nearest = np.argmin(np.einsum('nsk,nsk->ns', gap, gap), axis=1)
+    sites = np.arange(len(xy))
+    t = t[sites, nearest]
+    distance = chainage[nearest] + t * length[nearest]
+    # 到线段的垂直距离，带符号: 沿测线方向的右侧为正
+    unit = segment[nearest] / np.where(length[nearest] > 0, length[nearest], 1.0)[:, None]
+    gap = gap[sites, nearest]
+    offset = np.hypot(gap[:, 0], gap[:, 1]) * np.where(unit[:, 0] * gap[:, 1] - unit[:, 1] * gap[:, 0] < 0, -1, 1)
+    return distance, offset
+
+
+def project_profile(xy, profile='endpoints', azimuth=None, vertices=None):
+    """
+    Projects site coordinates onto a profile, all sites at once.
+
+    For the straight profiles ('endpoints', 'fit', 'azimuth') distances are measured from the first site,
+    for 'polyline' from the first vertex.
+
+    Parameters:
+    xy (array-like): Site coordinates, shape [nSites, 2] (ModEM x north, y east).
+    profile (str): One of PROFILE_TYPES.
+    azimuth (float): Profile azimuth in degrees, for profile='azimuth'.
+    vertices (array-like): Polyline vertices, shape [nVertices, 2], for profile='polyline'.
+
+    Returns:
+    distance (numpy.ndarray): Position of every site along the profile, shape [nSites].
+    offset (numpy.ndarray): Signed perpendicular distance from the profile, positive to the right of it.
+    order (numpy.ndarray): Site indices sorted by distance.
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    if profile == 'polyline':
+        if vertices is None:
+            raise ValueError("Vertices are required for profile='polyline'.")
+        distance, offset = project_polyline(xy, vertices)
+    else:
+        angle = profile_direction(xy, profile, azimuth)
+        rotation_matrix = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        # 一次矩阵乘法完成所有台站的旋转: 第一列为沿测线距离，第二列为垂直偏移
+        local = (xy - xy[0]) @ rotation_matrix
+        distance, offset = local[:, 0], local[:, 1]
+    return distance, offset, np.argsort(distance, kind='stable')
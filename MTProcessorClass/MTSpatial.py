@@ -0,0 +1,166 @@
+import numpy as np
+
+
+def _expand_ranges(starts, counts):
+    """Concatenates np.arange(start, start + count) for every pair without a Python loop."""
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return shift + np.arange(total)
+
+
+class SiteLocator:
+    """
+    Grid bucket index over the horizontal site coordinates (ModEM x north, y east, metres).
+
+    Sites are sorted by grid cell once, a query only checks the sites in the cells overlapping the query
+    region. The default cell size gives about one site per cell. Site names are kept in a hash map.
+    """
+    def __init__(self, xyz, sitenames=None, cell_size=None):
+        """
+        Parameters:
+        xyz (array-like): Site coordinates, shape [nSites, 2] or [nSites, 3].
+        sitenames (list): Site codes in the same order, used by index_of.
+        cell_size (float): Grid cell size in metres, estimated from the site density when None.
+        """
+        self.xyz = xyz
+        self.sitenames = sitenames
+        self.xy = np.ascontiguousarray(np.asarray(xyz, dtype=np.float64).reshape(len(xyz), -1)[:, :2])
+        self.names = {name: i for i, name in enumerate(sitenames)} if sitenames is not None else {}
+        n = len(self.xy)
+        self.lower = self.xy.min(axis=0) if n else np.zeros(2)
+        extent = (self.xy.max(axis=0) - self.lower) if n else np.zeros(2)
+        if cell_size is None:
+            # 每个网格约一个台站，沿最长方向的网格数不超过台站数 (如近似直线的测线)
+            cell_size = max(np.sqrt(extent[0] * extent[1] / max(n, 1)), extent.max() / max(n, 1))
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        # 网格大小由台站实际所在的网格确定，与查询使用同一个 _cells 计算 (extent // cell_size 可能因舍入少一格)
+        cells = self._cells(self.xy)
+        self.shape = cells.max(axis=0) + 1 if n else np.ones(2, dtype=np.int64)
+        cells = self._cell_keys(*cells.T)
+        self.order = np.argsort(cells, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(cells[self.order], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.xy)
+
+    def _cells(self, points):
+        return np.floor((np.asarray(points, dtype=np.float64) - self.lower) / self.cell_size).astype(np.int64)
+
+    def _cell_keys(self, ix, iy):
+        return ix * self.shape[1] + iy
+
+    def _candidates(self, xmin, ymin, xmax, ymax):
+        """Indices of the sites in the grid cells overlapping the box, the box itself is not checked."""
+        (ix0, iy0), (ix1, iy1) = self._cells([[xmin, ymin], [xmax, ymax]])
+        ix0, iy0 = max(ix0, 0), max(iy0, 0)
+        ix1, iy1 = min(ix1, self.shape[0] - 1), min(iy1, self.shape[1] - 1)
+        if ix0 > ix1 or iy0 > iy1:
+            return np.empty(0, dtype=np.int64)
+        wanted = self._cell_keys(np.arange(ix0, ix1 + 1)[:, None], np.arange(iy0, iy1 + 1)[None, :]).ravel()
+        position = np.searchsorted(self.keys, wanted)
+        found = position < len(self.keys)
+        position, wanted = position[found], wanted[found]
+        # 空网格的 searchsorted 结果指向下一个非空网格，需要排除
+        position = position[self.keys[position] == wanted]
+        return self.order[_expand_ranges(self.starts[position], self.counts[position])]
+
+    def in_box(self, xmin, ymin, xmax, ymax):
+        """
+        Sites inside a bounding box, boundaries included.
+
+        Returns:
+        indices (numpy.ndarray): Sorted site indices.
+        """
+        sites = self._candidates(xmin, ymin, xmax, ymax)
+        x, y = self.xy[sites].T
+        return np.sort(sites[(x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)])
+
+    def within(self, x, y, radius):
+        """
+        Sites within a distance of a point.
+
+        Returns:
+        indices (numpy.ndarray): Site indices, nearest first.
+        distances (numpy.ndarray): Their distances to the point.
+        """
+        sites = self._candidates(x - radius, y - radius, x + radius, y + radius)
+        distances = np.hypot(self.xy[sites, 0] - x, self.xy[sites, 1] - y)
+        keep = distances <= radius
+        sites, distances = sites[keep], distances[keep]
+        order = np.lexsort((sites, distances))
+        return sites[order], distances[order]
+
+    def nearest(self, x, y, k=1):
+        """
+        The k sites nearest to a point. The search radius starts at one cell and doubles until k sites are found.
+
+        Returns:
+        indices (numpy.ndarray): Site indices, nearest first, at most k.
+        distances (numpy.ndarray): Their distances to the point.
+        """
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # 超过该半径时必然覆盖所有台站
+        limit = np.hypot(*(np.abs(np.array([x, y]) - self.lower) + self.shape * self.cell_size))
+        radius = self.cell_size
+        while True:
+            sites, distances = self.within(x, y, radius)
+            if len(sites) >= k or radius >= limit:
+                return sites[:k], distances[:k]
+            radius *= 2
+
+    def index_of(self, name):
+        """Index of a site code."""
+        if name not in self.names:
+            raise ValueError(f"Unknown site: {name}")
+        return self.names[name]
+
+
+def brute_force_check(xy, n_queries=200, seed=0):
+    """
+    Compares nearest, within and in_box of a SiteLocator over xy with a full scan at random query points.
+
+    Returns:
+    failures (list): Descriptions of the queries whose results differ, empty when all agree.
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    locator = SiteLocator(xy)
+    rng = np.random.default_rng(seed)
+    lower, upper = xy.min(axis=0), xy.max(axis=0)
+    span = max((upper - lower).max(), 1.0)
+    # 查询点包括台站本身和范围内外的随机点
+    points = np.concatenate([xy, rng.uniform(lower - 0.1 * span, upper + 0.1 * span, (n_queries, 2))])
+    failures = []
+    for x, y in points:
+        distance = np.hypot(xy[:, 0] - x, xy[:, 1] - y)
+        k = min(int(rng.integers(1, 5)), len(xy))
+        _, found = locator.nearest(x, y, k)
+        if len(found) != k or not np.allclose(found, np.sort(distance)[:k]):
+            failures.append(f"nearest({x}, {y}, {k})")
+        radius = rng.uniform(0, 0.5 * span)
+        sites, _ = locator.within(x, y, radius)
+        if not np.array_equal(np.sort(sites), np.flatnonzero(distance <= radius)):
+            failures.append(f"within({x}, {y}, {radius})")
+        box = (x - radius, y - 0.5 * radius, x + 0.5 * radius, y + radius)
+        inside = (xy[:, 0] >= box[0]) & (xy[:, 0] <= box[2]) & (xy[:, 1] >= box[1]) & (xy[:, 1] <= box[3])
+        if not np.array_equal(locator.in_box(*box), np.flatnonzero(inside)):
+            failures.append(f"in_box{box}")
+    return failures
+
+
+if __name__ == '__main__':
+    # 与逐个台站计算的结果比较: 随机分布、近似直线的测线、重复坐标和网格边界的舍入情况
+    rng = np.random.default_rng(1)
+    layouts = {'scattered': rng.uniform(0, 1e5, (2000, 2)),
+               'profile': np.column_stack([np.linspace(0, 5e6, 500), rng.normal(0, 1, 500)]),
+               'duplicates': np.repeat(rng.uniform(0, 1e3, (20, 2)), 5, axis=0),
+               'rounding': np.array([[0, 0], [0, 7.7], [3.85, 15.4]])}
+    layouts.update({f"random {i}": rng.uniform(0, 100, (int(rng.integers(2, 30)), 2)) for i in range(2000)})
+    failed = {name: failures for name, xy in layouts.items()
+              if (failures := brute_force_check(xy, 20 if name.startswith('random') else 200))}
+    for name, failures in failed.items():
+        print(f"{name}: {len(failures)} 个查询结果不一致，例如 {failures[0]}")
+    print(f"{len(layouts) - len(failed)}/{len(layouts)} 种台站分布与逐个计算的结果一致")
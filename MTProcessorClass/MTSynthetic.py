@@ -0,0 +1,88 @@
+import numpy as np
+
+# 写入时使用的 ModEM 文件头
+_FILE_HEADER = ['# Synthetic ModEM impedance responses',
+                '# Period(s) Code GG_Lat GG_Lon X(m) Y(m) Z(m) Component Real Imag Error']
+_COMPONENTS = ['ZXX', 'ZXY', 'ZYX', 'ZYY']
+
+
+def synthetic_impedance(n_sites, n_periods, seed=0, noise=0.05):
+    """
+    Generates smooth, physically plausible impedances along a straight profile.
+
+    Each site has a resistivity curve rho(T) varying between ~10 and ~1000 Ohm.m, the off-diagonal
+    impedances follow |Z| = sqrt(5 rho / T) (the inverse of rho = 0.2 T |Z|^2) with a phase near 45 degrees,
+    and the diagonal components are small 3D distortions.
+
+    Parameters:
+    n_sites (int): Number of sites.
+    n_periods (int): Number of periods, log-spaced between 0.01 s and 1000 s.
+    seed (int): Seed of the random generator.
+    noise (float): Relative error assigned to every component.
+
+    Returns:
+    T (numpy.ndarray): Periods, shape [n_periods].
+    XYZ (numpy.ndarray): Site coordinates in metres, shape [n_sites, 3].
+    Z (numpy.ndarray): Complex impedances, shape [n_periods, n_sites, 2, 2].
+    Zerr (numpy.ndarray): Errors, shape [n_periods, n_sites, 2, 2].
+    """
+    rng = np.random.default_rng(seed)
+    T = np.logspace(-2, 3, n_periods)
+    # 沿 30 度方向的测线，台站间距约 1 km
+    offset = np.arange(n_sites) * 1000.0 + rng.normal(0, 50, n_sites)
+    XYZ = np.column_stack([offset * np.cos(np.pi / 6), offset * np.sin(np.pi / 6), rng.uniform(0, 500, n_sites)])
+
+    logT = np.log10(T)[:, None]
+    depth = rng.uniform(-1, 2, n_sites)[None, :]
+    log_rho = 2 + np.tanh(logT - depth) * rng.uniform(-1, 1, n_sites)[None, :]
+    amplitude = np.sqrt(5 * 10**log_rho / T[:, None])
+    phase = np.pi / 4 - 0.3 * np.gradient(log_rho, axis=0)
+    Zxy = amplitude * np.exp(1j * phase)
+
+    Z = np.empty((n_periods, n_sites, 2, 2), dtype=np.complex128)
+    Z[..., 0, 1] = Zxy
+    Z[..., 1, 0] = -Zxy * rng.uniform(0.8, 1.2, n_sites)
+    diagonal = 0.1 * amplitude[..., None] * (rng.normal(size=(n_periods, n_sites, 2))
+                                             + 1j * rng.normal(size=(n_periods, n_sites, 2)))
+    Z[..., 0, 0] = diagonal[..., 0]
+    Z[..., 1, 1] = diagonal[..., 1]
+    Zerr = noise * np.abs(Z)
+    return T, XYZ, Z, Zerr
+
+
+def write_synthetic_dat(path, n_sites, n_periods, seed=0, noise=0.05):
+    """
+    Writes a synthetic Z_ALL_3D file (one Full_Impedance block, 4 rows per site and period).
+    The file can be read with MyDataProcessor.read_file(path, 'Z_ALL_3D', read_start=2).
+
+    Returns:
+    path (str): The written file.
+    """
+    T, XYZ, Z, Zerr = synthetic_impedance(n_sites, n_periods, seed, noise)
+    lat = 30 + XYZ[:, 0] / 111000.0
+    lon = 100 + XYZ[:, 1] / 96000.0
+    # 行顺序: 台站 -> 周期 -> 分量
+    iS, iT, iC = (index.ravel() for index in
+                  np.meshgrid(np.arange(n_sites), np.arange(n_periods), np.arange(4), indexing='ij'))
+    flatZ = Z.reshape(n_periods, n_sites, 4)[iT, iS, iC]
+    flatErr = Zerr.reshape(n_periods, n_sites, 4)[iT, iS, iC]
+
+    table = np.empty((len(iT), 12), dtype=object)
+    table[:, 0] = T[iT]
+    table[:, 1] = np.char.add('S', np.char.zfill(iS.astype(str), 4))
+    table[:, 2] = lat[iS]
+    table[:, 3] = lon[iS]
+    table[:, 4] = XYZ[iS, 0]
+    table[:, 5] = XYZ[iS, 1]
+    table[:, 6] = XYZ[iS, 2]
+    table[:, 7] = np.array(_COMPONENTS)[iC]
+    table[:, 8] = flatZ.real
+    table[:, 9] = flatZ.imag
+    table[:, 10] = flatErr
+    table[:, 11] = 0
+
+    header = _FILE_HEADER + ['> Full_Impedance', '> exp(-i\\omega t)', '> [mV/km]/[nT]', '> 0.00',
+                             '> 0.000 0.000', f'> {n_periods} {n_sites}']
+    np.savetxt(path, table, fmt='%.4E %s %.5f %.5f %.1f %.1f %.1f %s %.5E %.5E %.5E %d',
+               header='\n'.join(header), comments='')
+    return path
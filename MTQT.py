@@ -1,9 +1,14 @@
 from Qt import QtCore, QtWidgets, QtGui
 import os
-from plotly.offline import plot
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from NodeGraphQt import BaseNode, NodeBaseWidget, NodeGraph
 from MTP2Node import *
+from MTBaseNodeManager.QtNodeAdapter import QtNodeSignals
+from MTBaseNodeManager.Profiling import format_timing
+from MTBaseNodeManager.WorkflowIO import save_workflow, read_workflow
 from Menu import *
 from ExtraWidget.CustomMessageBox import CustomMessageBox
 from functools import partial
@@ -25,12 +30,49 @@ class ChatWorker(QtCore.QObject):
         self.result_ready.emit(result)  # 发出结果信号
         self.finished.emit()  # 发出完成信号
 
+class WorkflowWorker(QtCore.QObject):
+    node_started = QtCore.Signal(str)  # 节点开始执行 (node_id)
+    node_finished = QtCore.Signal(str)  # 节点执行完成 (node_id)
+    node_failed = QtCore.Signal(str, str)  # 节点失败或被取消 (node_id, 错误信息)
+    finished = QtCore.Signal()  # 工作流执行结束
+
+    def __init__(self, workflow):
+        super(WorkflowWorker, self).__init__()
+        self.workflow = workflow
+        # 引擎的进度信号在工作线程中发出，经 Qt 信号转到界面线程
+        workflow.node_started.connect(self.node_started.emit)
+        workflow.node_finished.connect(self.node_finished.emit)
+        workflow.node_failed.connect(self.node_failed.emit)
+
+    def run(self):
+        """
+        在工作线程中执行工作流
+        """
+        try:
+            self.workflow.execute()
+        except Exception as e:
+            print(f"工作流执行失败: {str(e)}")
+        self.finished.emit()
+
+## 执行工作流时节点的颜色
+NODE_STATE_COLORS = {'running': (190, 140, 30), 'done': (40, 130, 60), 'failed': (170, 40, 40),
+                     'cancelled': (100, 100, 100)}
+
 ## 创建Nodegraph子类，添加connectionmgr和workflowengine
 class NodeGraphMT(NodeGraph):
     def __init__(self):
         super(NodeGraphMT, self).__init__()
         self.connectionmgr = ConnectionManager()
         self.langchainchat = Langchainchat()
+        self.workflow = None  # 最近一次执行的工作流
+        self.workflow_running = False
+        self.node_colors = {}  # 执行前节点的颜色 {node_id: 颜色}，下次执行时恢复
+        # 计算节点使用界面节点的唯一 id，避免同类节点 id 重复
+        self.node_created.connect(self.on_node_created)
+
+    def on_node_created(self, node):
+        if hasattr(node, 'MTnode'):
+            node.MTnode.id = node.id
 
     def add_connection(self, start_node, start_port, end_node, end_port):
         successful = self.connectionmgr.add_connection(start_node, start_port, end_node, end_port)
@@ -47,13 +89,133 @@ class NodeGraphMT(NodeGraph):
                 node.plotbrowser.deleteLater()
             self.delete_node(node)
 
-    def run_workflow(self):
+    def run_workflow(self, *_):
+        # 菜单动作会把 graph 作为参数传入，这里忽略
+        self._start_workflow(profile=False)
+
+    def profile_workflow(self, *_):
+        self._start_workflow(profile=True)
+
+    def _start_workflow(self, profile):
+        """在工作线程中执行工作流，界面保持响应，节点颜色显示执行状态"""
+        if self.workflow_running:
+            print("工作流正在执行")
+            return
         nodes = self.connectionmgr.nodes
-        workflow = WorkflowEngine(self.connectionmgr)
-        order = workflow.prepare_execution()
+        self.workflow = WorkflowEngine(self.connectionmgr, profile=profile)
+        order = self.workflow.prepare_execution()
         print(order)
-        workflow.execute()
+        self.restore_node_colors()
+
+        # 创建线程
+        self.workflow_thread = QtCore.QThread()
+        self.workflow_worker = WorkflowWorker(self.workflow)
+        self.workflow_worker.moveToThread(self.workflow_thread)
+
+        # 连接信号和槽
+        self.workflow_thread.started.connect(self.workflow_worker.run)
+        # 绑定方法作为槽，在界面线程中排队执行 (lambda 会在工作线程中直接调用)
+        self.workflow_worker.node_started.connect(self.on_node_started)
+        self.workflow_worker.node_finished.connect(self.on_node_finished)
+        self.workflow_worker.node_failed.connect(self.on_node_failed)
+        self.workflow_worker.finished.connect(self.on_workflow_finished)
+        self.workflow_worker.finished.connect(self.workflow_thread.quit)
+        self.workflow_worker.finished.connect(self.workflow_worker.deleteLater)
+        self.workflow_thread.finished.connect(self.workflow_thread.deleteLater)
+
+        # 启动线程
+        self.workflow_running = True
+        self.workflow_thread.start()
+
+    def cancel_workflow(self):
+        """取消正在执行的工作流，当前节点在下一次检查取消标志时停止"""
+        if self.workflow_running:
+            self.workflow.cancel()
+
+    def on_workflow_finished(self):
+        self.workflow_running = False
+        if self.workflow.profile:
+            self.workflow.print_report()
+            self.show_timings(self.workflow.report)
+
+    def on_node_started(self, node_id):
+        self.set_node_state(node_id, 'running')
+
+    def on_node_finished(self, node_id):
+        self.set_node_state(node_id, 'done')
+
+    def on_node_failed(self, node_id, message):
+        self.set_node_state(node_id, 'cancelled' if self.workflow.cancel_token.cancelled else 'failed')
+        node = self.get_node_by_id(node_id)
+        if node is not None:
+            node.view.setToolTip(message)
+
+    def set_node_state(self, node_id, state):
+        node = self.get_node_by_id(node_id)
+        if node is None:
+            return
+        self.node_colors.setdefault(node_id, node.color())
+        node.set_color(*NODE_STATE_COLORS[state])
+
+    def restore_node_colors(self):
+        for node_id, color in self.node_colors.items():
+            node = self.get_node_by_id(node_id)
+            if node is not None:
+                node.set_color(*color[:3])
+        self.node_colors = {}
+
+    def show_timings(self, report):
+        """在节点的提示信息中显示耗时、CPU 时间、峰值内存和输出大小"""
+        for node in self.all_nodes():
+            timing = report.get(node.id) if hasattr(node, 'MTnode') else None
+            if timing is None:
+                continue
+            node.view.setToolTip(f"{format_timing(timing)}\n"
+                                 f"CPU {timing.cpu * 1000:.1f} ms, output {timing.output_bytes / 1024**2:.1f} MB")
     
+    def save_workflow(self, path):
+        """保存所有节点 (包括未连接的节点)、参数、坐标和连接到 JSON 文件"""
+        nodes, ui = [], {}
+        for node in self.all_nodes():
+            if hasattr(node, 'MTnode'):
+                node.MTnode.position = tuple(node.pos())
+                nodes.append(node.MTnode)
+                ui[node.MTnode.id] = {'ui': node.type_, 'name': node.name()}
+        save_workflow(self.connectionmgr, path, nodes, ui)
+
+    def load_workflow(self, path):
+        """从 JSON 文件重建界面节点和 ConnectionManager，节点获得新的 id"""
+        data = read_workflow(path)
+        created = {}
+        for entry in data['nodes']:
+            node_type = entry.get('ui') or UI_NODE_TYPES[entry['class']]
+            node = self.create_node(node_type, name=entry.get('name'), pos=entry.get('position'), push_undo=False)
+            for name, value in entry.get('params', {}).items():
+                node.MTnode.set_param(name, value)
+            # 同步自定义控件显示的参数
+            for widget in node.widgets().values():
+                value = widget.get_value()
+                if isinstance(value, dict):
+                    widget.set_value({key: node.MTnode.params.get(key, value[key]) for key in value})
+            created[entry['id']] = node
+        for c in data['connections']:
+            source, target = created[c['source']], created[c['target']]
+            # 直接连接端口而不发出信号，连接关系由下面的 add_connection 记录
+            source.get_output(c['source_port']).connect_to(target.get_input(c['target_port']),
+                                                            push_undo=False, emit_signal=False)
+            self.connectionmgr.add_connection(source.MTnode, c['source_port'], target.MTnode, c['target_port'])
+        return list(created.values())
+
+    def on_save_menu(self):
+        path = QtWidgets.QFileDialog.getSaveFileName(None, 'Save Workflow', '', 'Workflow (*.json)')[0]
+        if path:
+            self.save_workflow(path)
+
+    def on_load_menu(self):
+        path = QtWidgets.QFileDialog.getOpenFileName(None, 'Load Workflow', '', 'Workflow (*.json)')[0]
+        if path:
+            self.load_workflow(path)
+
     def chat_with_ai(self, prompt):
         """
         在单独的线程中运行 chat_with_ai
@@ -114,6 +276,16 @@ class NodeGraphMT(NodeGraph):
 
 
 ############################################################################################################
+##计算节点类名与界面节点类型的对应关系 (加载无界面信息的工作流文件时使用)
+UI_NODE_TYPES = {'InputFileNode': 'InputFileNode.InputFileNodeUI',
+                 'PhaseTensorNode': 'PhaseTensorNode.PhaseTensorNodeUI',
+                 'ApparentResistivityNode': 'ApparentResistivityNode.ApparentResistivityNodeUI',
+                 'UnpackDataNode': 'UnpackDataNode.UnpackDataNodeUI',
+                 'OutputMTPNode': 'OutputNode.OutputNodeUI',
+                 'OutputApparentResistivityNode': 'OutputResistivityPlotNode.OutputResistivityPlotNodeUI',
+                 'OutputPseudoSectionNode': 'OutputPseudoSectionNode.OutputPseudoSectionNodeUI',
+                 'OutputPhaseTensorEllipseNode': 'OutputPhaseTensorEllipseNode.OutputPhaseTensorEllipseNodeUI'}
+
 ##所有节点列表
 input_nodes = ['InputFileNode.InputFileNodeUI']
 compute_nodes = ['PhaseTensorNode.PhaseTensorNodeUI', 'ApparentResistivityNode.ApparentResistivityNodeUI', 'UnpackDataNode.UnpackDataNodeUI']
@@ -227,6 +399,7 @@ class PhaseTensorNodeUI(BaseNode):
         # create input and output port.
         self.add_input('Processor')
         self.add_output('Processor')
+        self.add_output('Tiles')
         self.MTnode = PhaseTensorNode('PhaseTensor', 'PhaseTensor')
 ## 2.2 视电阻率计算节点
 class ApparentResistivityNodeUI(BaseNode):
@@ -239,6 +412,7 @@ class ApparentResistivityNodeUI(BaseNode):
         # create input and output port.
         self.add_input('Processor')
         self.add_output('Processor')
+        self.add_output('Tiles')
         self.MTnode = ApparentResistivityNode('ApparentResistivity', 'ApparentResistivity')
 ## 2.3 数据拆包节点
 class UnpackDataNodeUI(BaseNode):
@@ -311,13 +485,27 @@ class OutputResistivityPlotNodeWidget(QtWidgets.QWidget):
         self.plotbrowser.deleteLater()
         super(OutputResistivityPlotNodeWidget, self).closeEvent(event)
 
+# 视电阻率图所在 div 的 id，翻页时通过 Plotly.react 原地更新
+PLOT_DIV_ID = 'mt-resistivity-plot'
+# 缓存的台站图数量上限 (LRU)
+PLOT_CACHE_SIZE = 64
+# 翻页后在后台预取前后各几个台站的图
+PREFETCH_RADIUS = 2
+
 class OutputResistivityPlotNodeWrapper(NodeBaseWidget):
     def __init__(self, parent=None, MTnode=None):
         super(OutputResistivityPlotNodeWrapper, self).__init__(parent)
         self.set_name('outputplot')
         self.set_label('OutputPlot')
         self.MTnode = MTnode
+        self.node_signals = QtNodeSignals(MTnode)  # 在界面线程中接收节点的 finished 信号
         self.plotbrowser = None  # 初始化 plotbrowser
+        # 台站图的 JSON 缓存 {台站序号: JSON}，按最近使用排序，后台预取线程与界面线程共用
+        self.payloads = OrderedDict()
+        self.payload_lock = threading.Lock()
+        self.prefetcher = ThreadPoolExecutor(max_workers=1)
+        self.generation = 0  # 节点重新执行后递增，旧数据的预取结果不再写入缓存
+        self.page_ready = False  # 页面中的图已加载，可以原地更新
         self.set_custom_widget(OutputResistivityPlotNodeWidget())
         self.wire_signals()
 
@@ -325,6 +513,7 @@ class OutputResistivityPlotNodeWrapper(NodeBaseWidget):
         """
         确保在对象销毁时释放 QWebEngineView
         """
+        self.prefetcher.shutdown(wait=False, cancel_futures=True)
         if self.plotbrowser:
             self.plotbrowser.deleteLater()
     
@@ -337,20 +526,88 @@ class OutputResistivityPlotNodeWrapper(NodeBaseWidget):
     def wire_signals(self):
         self.get_custom_widget().btn_up.clicked.connect(partial(self.change_site_index_and_execute, 1))
         self.get_custom_widget().btn_down.clicked.connect(partial(self.change_site_index_and_execute, -1))
-        self.MTnode.finished.connect(self.update_plot)
+        self.node_signals.finished.connect(self.update_plot)
+        self.get_custom_widget().plotbrowser.loadFinished.connect(self.on_page_loaded)
 
     def change_site_index_and_execute(self, index):
-        self.MTnode.site_index = index + self.MTnode.site_index
-        self.MTnode.execute_and_emit()
+        # 超出台站范围 (或尚无数据) 时不做任何事
+        if not self.MTnode.set_site_index(index + self.MTnode.site_index):
+            return
+        if not self.page_ready:
+            self.MTnode.execute_and_emit()
+            return
+        # 只把新台站的数据推送到已加载的页面，不重新生成和加载 HTML
+        payload = self.site_payload(self.MTnode.site_index)
+        self.get_custom_widget().plotbrowser.page().runJavaScript(
+            f"(function(fig){{Plotly.react('{PLOT_DIV_ID}', fig.data, fig.layout);}})({payload});")
+        self.update_title()
+        self.prefetch_neighbours()
 
     def update_plot(self, include_plotlyjs='directory'):
+        """节点执行后重新加载整个页面，并清空旧数据的缓存"""
+        with self.payload_lock:
+            self.generation += 1
+            self.payloads.clear()
+        self.page_ready = False
         fig = self.MTnode.restorefigure
-        html = plot(fig, output_type='div', include_plotlyjs=include_plotlyjs, config={'displayModeBar': False}, image_width=1200, image_height=800)
+        self.store_payload(self.generation, self.MTnode.site_index, fig.to_json())
+        html = fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs, div_id=PLOT_DIV_ID,
+                           config={'displayModeBar': False})
         # 获取当前路径
         path = os.path.abspath('plotly.min.js')
         self.get_custom_widget().plotbrowser.setHtml(html, QtCore.QUrl.fromLocalFile(path))
         self.get_custom_widget().label_title.setText('Apparent Resistivity Plot: Preparing...')
 
+    def on_page_loaded(self, ok):
+        self.page_ready = ok
+        if ok:
+            self.update_title()
+            self.prefetch_neighbours()
+
+    def update_title(self):
+        names = self.MTnode.MTP.DataFromDat.sitenames
+        index = self.MTnode.site_index
+        self.get_custom_widget().label_title.setText(
+            f'Apparent Resistivity Plot: {names[index]} ({index + 1}/{len(names)})')
+
+    def site_payload(self, site_index):
+        """返回台站图的 JSON，未缓存时在当前线程中生成"""
+        with self.payload_lock:
+            generation = self.generation
+            if site_index in self.payloads:
+                self.payloads.move_to_end(site_index)
+                return self.payloads[site_index]
+        payload = self.MTnode.site_figure(site_index).to_json()
+        self.store_payload(generation, site_index, payload)
+        return payload
+
+    def store_payload(self, generation, site_index, payload):
+        with self.payload_lock:
+            if generation != self.generation:
+                return
+            self.payloads[site_index] = payload
+            self.payloads.move_to_end(site_index)
+            while len(self.payloads) > PLOT_CACHE_SIZE:
+                self.payloads.popitem(last=False)
+
+    def prefetch_neighbours(self):
+        """在后台线程中生成当前台站前后 PREFETCH_RADIUS 个台站的图"""
+        index, n_sites = self.MTnode.site_index, self.MTnode.n_sites
+        with self.payload_lock:
+            generation = self.generation
+            missing = [i for offset in range(1, PREFETCH_RADIUS + 1) for i in (index + offset, index - offset)
+                       if 0 <= i < n_sites and i not in self.payloads]
+        for i in missing:
+            self.prefetcher.submit(self.prefetch, generation, i)
+
+    def prefetch(self, generation, site_index):
+        if generation != self.generation:
+            return
+        try:
+            self.store_payload(generation, site_index, self.MTnode.site_figure(site_index).to_json())
+        except Exception as e:
+            print(f"预取台站 {site_index} 失败: {str(e)}")
+
 class OutputResistivityPlotNodeUI(BaseNode):
     NODE_NAME = 'Outputplot'
     NODE_CATEGORY = 'Output'
@@ -361,12 +618,211 @@ class OutputResistivityPlotNodeUI(BaseNode):
 
         # create input and output port.
         self.add_input('Processor')
+        self.add_input('Tiles')
         self.MTnode = OutputApparentResistivityNode('outputplot', 'outputplot')
         # add custom widget to node with "node.view" as the parent.
         node_widget = OutputResistivityPlotNodeWrapper(self.view, self.MTnode)
         self.add_custom_widget(node_widget, tab='Custom')
         self.plotbrowser = node_widget.get_custom_widget().plotbrowser
 
+## 3.3 拟断面画图输出节点
+class OutputPseudoSectionNodeWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(OutputPseudoSectionNodeWidget, self).__init__(parent)
+        ## 设置图片说明
+        self.label_title = QtWidgets.QLabel('Pseudo Section: Not Available')
+        self.label_title.setStyleSheet("color: white;")  # 设置字体颜色为白色
+
+        ## 设置参数和分量
+        self.combo_parameter = QtWidgets.QComboBox()
+        self.combo_parameter.addItems(OutputPseudoSectionNode.PARAMETERS)
+        self.combo_component = QtWidgets.QComboBox()
+        self.combo_component.addItems(OutputPseudoSectionNode.COMPONENTS)
+        self.combo_component.setCurrentText('xy')
+
+        ## 准备图片需要嵌入的 widget
+        self.plotbrowser = QWebEngineView(self)
+        self.plotbrowser.setFixedHeight(500)
+        self.plotbrowser.setFixedWidth(800)
+        self.plotbrowser.setHtml("")
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.label_title)
+        layout.addWidget(self.combo_parameter)
+        layout.addWidget(self.combo_component)
+        layout.addWidget(self.plotbrowser)
+        layout.addStretch()
+
+    def closeEvent(self, event):
+        """
+        在窗口关闭时释放 QWebEngineView
+        """
+        self.plotbrowser.deleteLater()
+        super(OutputPseudoSectionNodeWidget, self).closeEvent(event)
+
+class OutputPseudoSectionNodeWrapper(NodeBaseWidget):
+    def __init__(self, parent=None, MTnode=None):
+        super(OutputPseudoSectionNodeWrapper, self).__init__(parent)
+        self.set_name('pseudosection')
+        self.set_label('PseudoSection')
+        self.MTnode = MTnode
+        self.node_signals = QtNodeSignals(MTnode)  # 在界面线程中接收节点的 finished 信号
+        self.set_custom_widget(OutputPseudoSectionNodeWidget())
+        self.wire_signals()
+
+    def wire_signals(self):
+        widget = self.get_custom_widget()
+        widget.combo_parameter.currentTextChanged.connect(lambda text: self.change_param_and_plot('parameter', text))
+        widget.combo_component.currentTextChanged.connect(lambda text: self.change_param_and_plot('component', text))
+        self.node_signals.finished.connect(self.update_plot)
+
+    def change_param_and_plot(self, name, value):
+        self.MTnode.set_param(name, value)
+        # 节点已执行过时直接用已有数据重新绘图
+        if getattr(self.MTnode, 'MTP', None) is not None:
+            try:
+                self.MTnode.execute_and_emit()
+            except ValueError as e:
+                self.get_custom_widget().label_title.setText(f'Pseudo Section: {e}')
+
+    def get_value(self):
+        widget = self.get_custom_widget()
+        return {'parameter': widget.combo_parameter.currentText(),
+                'component': widget.combo_component.currentText()}
+
+    def set_value(self, value):
+        widget = self.get_custom_widget()
+        widget.combo_parameter.setCurrentText(value['parameter'])
+        widget.combo_component.setCurrentText(value['component'])
+
+    def update_plot(self, include_plotlyjs='directory'):
+        # 单个 Heatmap，数组以二进制编码写入页面
+        fig = self.MTnode.restorefigure
+        show_figure(self.get_custom_widget().plotbrowser, fig, include_plotlyjs)
+        self.get_custom_widget().label_title.setText(f'Pseudo Section: {fig.layout.title.text}')
+
+class OutputPseudoSectionNodeUI(BaseNode):
+    NODE_NAME = 'PseudoSection'
+    NODE_CATEGORY = 'Output'
+    __identifier__ = 'OutputPseudoSectionNode'
+
+    def __init__(self):
+        super(OutputPseudoSectionNodeUI, self).__init__()
+
+        # create input port.
+        self.add_input('Processor')
+        self.MTnode = OutputPseudoSectionNode('pseudosection', 'pseudosection')
+        # add custom widget to node with "node.view" as the parent.
+        node_widget = OutputPseudoSectionNodeWrapper(self.view, self.MTnode)
+        self.add_custom_widget(node_widget, tab='Custom')
+        self.plotbrowser = node_widget.get_custom_widget().plotbrowser
+
+## 3.4 相位张量椭圆画图输出节点
+class OutputPhaseTensorEllipseNodeWidget(QtWidgets.QWidget):
+    def __init__(self, parent=None):
+        super(OutputPhaseTensorEllipseNodeWidget, self).__init__(parent)
+        ## 设置图片说明
+        self.label_title = QtWidgets.QLabel('Phase Tensor Ellipses: Not Available')
+        self.label_title.setStyleSheet("color: white;")  # 设置字体颜色为白色
+
+        ## 设置绘图方式、周期和着色参数
+        self.combo_mode = QtWidgets.QComboBox()
+        self.combo_mode.addItems(OutputPhaseTensorEllipseNode.MODES)
+        self.spin_period = QtWidgets.QSpinBox()
+        self.spin_period.setPrefix('Period index: ')
+        self.combo_color = QtWidgets.QComboBox()
+        self.combo_color.addItems(OutputPhaseTensorEllipseNode.COLORS)
+
+        ## 准备图片需要嵌入的 widget
+        self.plotbrowser = QWebEngineView(self)
+        self.plotbrowser.setFixedHeight(500)
+        self.plotbrowser.setFixedWidth(800)
+        self.plotbrowser.setHtml("")
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.addWidget(self.label_title)
+        layout.addWidget(self.combo_mode)
+        layout.addWidget(self.spin_period)
+        layout.addWidget(self.combo_color)
+        layout.addWidget(self.plotbrowser)
+        layout.addStretch()
+
+    def closeEvent(self, event):
+        """
+        在窗口关闭时释放 QWebEngineView
+        """
+        self.plotbrowser.deleteLater()
+        super(OutputPhaseTensorEllipseNodeWidget, self).closeEvent(event)
+
+class OutputPhaseTensorEllipseNodeWrapper(NodeBaseWidget):
+    def __init__(self, parent=None, MTnode=None):
+        super(OutputPhaseTensorEllipseNodeWrapper, self).__init__(parent)
+        self.set_name('ptellipse')
+        self.set_label('PhaseTensorEllipse')
+        self.MTnode = MTnode
+        self.node_signals = QtNodeSignals(MTnode)  # 在界面线程中接收节点的 finished 信号
+        self.set_custom_widget(OutputPhaseTensorEllipseNodeWidget())
+        self.wire_signals()
+
+    def wire_signals(self):
+        widget = self.get_custom_widget()
+        widget.combo_mode.currentTextChanged.connect(lambda text: self.change_param_and_plot('mode', text))
+        widget.spin_period.valueChanged.connect(lambda value: self.change_param_and_plot('period_index', value))
+        widget.combo_color.currentTextChanged.connect(lambda text: self.change_param_and_plot('color', text))
+        self.node_signals.finished.connect(self.update_plot)
+
+    def change_param_and_plot(self, name, value):
+        self.MTnode.set_param(name, value)
+        # 节点已执行过时直接用已有数据重新绘图
+        if getattr(self.MTnode, 'MTP', None) is not None:
+            try:
+                self.MTnode.execute_and_emit()
+            except ValueError as e:
+                self.get_custom_widget().label_title.setText(f'Phase Tensor Ellipses: {e}')
+
+    def get_value(self):
+        widget = self.get_custom_widget()
+        return {'mode': widget.combo_mode.currentText(), 'period_index': widget.spin_period.value(),
+                'color': widget.combo_color.currentText()}
+
+    def set_value(self, value):
+        widget = self.get_custom_widget()
+        widget.combo_mode.setCurrentText(value['mode'])
+        widget.spin_period.setValue(value['period_index'])
+        widget.combo_color.setCurrentText(value['color'])
+
+    def update_plot(self, include_plotlyjs='directory'):
+        fig = self.MTnode.restorefigure
+        # 周期序号的范围由数据决定
+        self.get_custom_widget().spin_period.setMaximum(self.MTnode.MTP.DataFromDat.nTx - 1)
+        show_figure(self.get_custom_widget().plotbrowser, fig, include_plotlyjs)
+        self.get_custom_widget().label_title.setText(f'Phase Tensor Ellipses: {fig.layout.title.text}')
+
+class OutputPhaseTensorEllipseNodeUI(BaseNode):
+    NODE_NAME = 'PTEllipse'
+    NODE_CATEGORY = 'Output'
+    __identifier__ = 'OutputPhaseTensorEllipseNode'
+
+    def __init__(self):
+        super(OutputPhaseTensorEllipseNodeUI, self).__init__()
+
+        # create input port.
+        self.add_input('Processor')
+        self.MTnode = OutputPhaseTensorEllipseNode('ptellipse', 'ptellipse')
+        # add custom widget to node with "node.view" as the parent.
+        node_widget = OutputPhaseTensorEllipseNodeWrapper(self.view, self.MTnode)
+        self.add_custom_widget(node_widget, tab='Custom')
+        self.plotbrowser = node_widget.get_custom_widget().plotbrowser
+
+
+def show_figure(plotbrowser, fig, include_plotlyjs='directory'):
+    """
+    将 Plotly 图写入 QWebEngineView，plotly.min.js 从当前目录加载
+    """
+    html = fig.to_html(full_html=False, include_plotlyjs=include_plotlyjs, config={'displayModeBar': False})
+    path = os.path.abspath('plotly.min.js')
+    plotbrowser.setHtml(html, QtCore.QUrl.fromLocalFile(path))
+
 
 def cleanup_webengine_views(node_graph):
     """
@@ -388,6 +844,8 @@ if __name__ == '__main__':
     node_graph.register_node(OutputNodeUI)
     node_graph.register_node(UnpackDataNodeUI)
     node_graph.register_node(OutputResistivityPlotNodeUI)
+    node_graph.register_node(OutputPseudoSectionNodeUI)
+    node_graph.register_node(OutputPhaseTensorEllipseNodeUI)
 
     # get the main context menu.
     context_menu = node_graph.get_context_menu('graph')
@@ -395,9 +853,16 @@ if __name__ == '__main__':
     # 添加AI菜单
     AI_menu = context_menu.add_command('AI', node_graph.on_AI_menu, 'Shift+A')
 
+    # 添加文件菜单
+    File_menu = context_menu.add_menu('File')
+    File_menu.add_command('Save work flow', node_graph.on_save_menu, 'Ctrl+S')
+    File_menu.add_command('Load work flow', node_graph.on_load_menu, 'Ctrl+O')
+
     # 添加图菜单
     Run_menu = context_menu.add_menu('Run')
     Run_menu.add_command('Run work flow', node_graph.run_workflow, 'Shift+R')
+    Run_menu.add_command('Profile work flow', node_graph.profile_workflow, 'Shift+P')
+    Run_menu.add_command('Cancel work flow', node_graph.cancel_workflow, 'Shift+C')
  
     Node_menu = context_menu.add_menu('Node')
     Input_menu = Node_menu.add_menu('Input')
@@ -410,6 +875,8 @@ if __name__ == '__main__':
     Compute_menu.add_command('UnpackDataNode', lambda: node_graph.create_node('UnpackDataNode.UnpackDataNodeUI', name='Default_Unpack'))
     Output_menu.add_command('OutputNode', lambda: node_graph.create_node('OutputNode.OutputNodeUI', name='Default_Output'))
     Output_menu.add_command('OutputResistivityPlotNode', lambda: node_graph.create_node('OutputResistivityPlotNode.OutputResistivityPlotNodeUI', name='Default_OutputPlot'))
+    Output_menu.add_command('OutputPseudoSectionNode', lambda: node_graph.create_node('OutputPseudoSectionNode.OutputPseudoSectionNodeUI', name='Default_PseudoSection'))
+    Output_menu.add_command('OutputPhaseTensorEllipseNode', lambda: node_graph.create_node('OutputPhaseTensorEllipseNode.OutputPhaseTensorEllipseNodeUI', name='Default_PTEllipse'))
 
     # 添加节点右键菜单
     nodes_menu = node_graph.get_context_menu('nodes')
@@ -0,0 +1,63 @@
+"""
+无界面运行保存的工作流，不依赖 Qt 事件循环、NodeGraphQt、WebEngine 或 AI 模块。
+
+用法:
+    python MTRun.py workflow.json [-j 4] [--set input1.path=/data/BYKLData.dat] [--trace run.json]
+"""
+import argparse
+import json
+import sys
+import time
+from MTBaseNodeManager.BaseNodeManager import WorkflowEngine
+from MTBaseNodeManager.WorkflowIO import load_workflow
+from MTP2Node import NODE_CLASSES
+
+
+def parse_override(text):
+    """解析 node_id.param=value，value 优先按 JSON 解析，否则作为字符串"""
+    target, sep, value = text.partition('=')
+    node_id, dot, param = target.partition('.')
+    if not sep or not dot:
+        raise argparse.ArgumentTypeError(f"expected node_id.param=value, got {text!r}")
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return node_id, param, value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a saved MT workflow without the GUI.')
+    parser.add_argument('workflow', help='workflow JSON file')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='number of nodes to run concurrently')
+    parser.add_argument('--set', dest='overrides', type=parse_override, action='append', default=[],
+                        metavar='NODE.PARAM=VALUE', help='override a node parameter, may be repeated')
+    parser.add_argument('--profile', action='store_true', help='print per-node time and memory usage')
+    parser.add_argument('--trace', metavar='PATH', help='write a Chrome trace JSON of the run (implies --profile)')
+    args = parser.parse_args(argv)
+
+    conn_mgr = load_workflow(args.workflow, NODE_CLASSES)
+    for node_id, param, value in args.overrides:
+        if node_id not in conn_mgr.nodes:
+            parser.error(f"unknown node: {node_id}")
+        conn_mgr.nodes[node_id].set_param(param, value)
+
+    workflow = WorkflowEngine(conn_mgr, max_workers=args.workers, profile=args.profile or bool(args.trace))
+    order = workflow.prepare_execution()
+    start = time.perf_counter()
+    context = workflow.execute()
+    failed = [node_id for node_id in order if node_id not in context]
+    print(f"完成 {len(context)}/{len(order)} 个节点，用时 {time.perf_counter() - start:.3f} s")
+    if workflow.profile:
+        workflow.print_report()
+    if args.trace:
+        workflow.write_trace(args.trace)
+        print(f"计时已写入 {args.trace}")
+    if failed:
+        print(f"未完成的节点: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())